@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import os
+import shutil
 from getpass import getpass
 from pathlib import Path
 
 import yaml
 
 from sar.auth.passwords import hash_password
-from sar.auth.users import DEFAULT_USERS_PATH
+from sar.auth.users import DEFAULT_USERS_PATH, YAML_SAFE_DUMPER, YAML_SAFE_LOADER
 
 USERS_PATH = DEFAULT_USERS_PATH
 
@@ -15,7 +17,7 @@ USERS_PATH = DEFAULT_USERS_PATH
 def main() -> None:
     USERS_PATH.parent.mkdir(parents=True, exist_ok=True)
     if USERS_PATH.exists():
-        raw = yaml.safe_load(USERS_PATH.read_text(encoding="utf-8")) or {}
+        raw = yaml.load(USERS_PATH.read_text(encoding="utf-8"), Loader=YAML_SAFE_LOADER) or {}
     else:
         raw = {"version": 1, "users": {}}
 
@@ -38,7 +40,16 @@ def main() -> None:
         "password_hash": hash_password(pw1),
     }
 
-    USERS_PATH.write_text(yaml.safe_dump(raw, sort_keys=False, allow_unicode=True), encoding="utf-8")
+    # Dump to a sibling temp file and swap it in, so a failed dump never leaves a torn users file.
+    tmp = USERS_PATH.with_name(USERS_PATH.name + ".tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            yaml.dump(raw, f, Dumper=YAML_SAFE_DUMPER, sort_keys=False, allow_unicode=True)
+        if USERS_PATH.exists():
+            shutil.copymode(USERS_PATH, tmp)
+        os.replace(tmp, USERS_PATH)
+    finally:
+        tmp.unlink(missing_ok=True)
     print(f"OK -> {USERS_PATH}")
 
 
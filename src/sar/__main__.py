@@ -4,14 +4,39 @@ Run with:
   python -m sar
 """
 
+import importlib.util
 import os
+import sys
+
 import uvicorn
 
+
+def _loop_impl() -> str:
+    # uvloop no existe en Windows; en el resto se usa si está instalado (extra "fast").
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None:
+        return "uvloop"
+    return "asyncio"
+
+
+def _http_impl() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+
+
 def main() -> None:
     host = os.getenv("SAR_HOST", "0.0.0.0")
     port = int(os.getenv("SAR_PORT", "8000"))
     reload = os.getenv("SAR_RELOAD", "false").lower() in {"1", "true", "yes", "y"}
-    uvicorn.run("sar.app:app", host=host, port=port, reload=reload)
+    log_level = os.getenv("SAR_LOG_LEVEL", "info").lower()
+    # Un único proceso: el registry activo, el lock de escritura y las cachés viven en memoria.
+    uvicorn.run(
+        "sar.app:app",
+        host=host,
+        port=port,
+        reload=reload,
+        loop=_loop_impl(),
+        http=_http_impl(),
+        log_level=log_level,
+    )
 
 if __name__ == "__main__":
     main()
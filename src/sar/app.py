@@ -5,23 +5,47 @@ from __future__ import annotations
 
 import os
 import re
-import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlencode
 
+import jinja2
+import numpy as np
 import pandas as pd
 from fastapi import Depends, FastAPI, File, Form, Request, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, PlainTextResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+# Optional dependency: serialize JSON with orjson when it is installed.
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as JSONResponse
+except ImportError:  # pragma: no cover
+    from fastapi.responses import JSONResponse
+
 from sar.auth.session import COOKIE_NAME, sign_session
 from sar.auth.users import authenticate
 from sar.permissions import cookie_settings, current_user_optional, require_role, require_user
 
-from sar.core.utils import canon, df_to_csv_stream, first_existing_col, safe_count
-from sar.infra.registry_repo import read_sheet, lookup_options_by_level
+from sar.core.utils import (
+    canon,
+    canon_series,
+    df_to_csv_stream,
+    first_existing_col,
+    isin_ids,
+    safe_count,
+    search_text,
+    text_search_mask,
+)
+from sar.infra.registry_repo import read_sheet, read_sheets, lookup_options_by_level, sheet_hid_index
 from sar.infra.registry_repo import (
+    create_registry_from_template,
     read_meta_dict,
     write_meta_kv,
     get_schema_map,
@@ -44,7 +68,12 @@ from sar.services.record_service import (
 from sar.services.diagram_service import build_record_diagram
 from sar.services.report_service import generate_c4_chain_report_docx, generate_c4_chain_report_html
 
-app = FastAPI()
+# Copy-on-Write: read handlers filter STATE frames without defensive copies
+# (always enabled from pandas 3.0, where the option is deprecated).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+app = FastAPI(default_response_class=JSONResponse)
 
 
 @app.middleware("http")
@@ -55,7 +84,22 @@ async def _auth_middleware(request: Request, call_next):
 BASE_DIR = Path(__file__).resolve().parent
 
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+
+# Compiled templates are cached on disk so restarts skip re-parsing them.
+_JINJA_CACHE_DIR = os.getenv("SAR_JINJA_CACHE_DIR")
+if _JINJA_CACHE_DIR:
+    Path(_JINJA_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(BASE_DIR / "templates")),
+        autoescape=True,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(_JINJA_CACHE_DIR),
+    )
+)
+
+# Warm the heavy table templates so the first request doesn't pay for compiling them.
+for _name in ("view_full.html", "level_list.html", "record.html"):
+    templates.get_template(_name)
 
 DATA_DIR = Path(os.getenv("SAR_DATA_DIR", "data")).resolve()
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -74,6 +118,16 @@ REPORT_TEMPLATE_HTML = Path(
 REPORTS_DIR = Path(os.getenv("SAR_REPORTS_DIR", str(DATA_DIR / "reports"))).resolve()
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Uploads are written to disk in chunks of this size (bytes)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Seconds a cached "registry file exists" check stays valid
+PATH_CHECK_TTL = 30.0
+
+# Server-side pagination for table views
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 SCHEMA_SHEETS = [
     "META",
     "LOOKUPS",
@@ -84,31 +138,194 @@ SCHEMA_SHEETS = [
     "C4_Runtime",
 ]
 
-STATE = {
-    "path": "",
-    "view_full": pd.DataFrame(),
-    "issues": pd.DataFrame(),
-    "views_by_level": {},
-    "last_error": "",
-    "last_regen": "",
-}
+# Fields whose replacement invalidates derived caches (see AppState.version)
+_VIEW_FIELDS = frozenset({"path", "view_full", "issues", "views_by_level"})
+
+
+@dataclass(slots=True)
+class AppState:
+    """In-process state for the loaded registry.
+
+    `version` is bumped whenever the views are replaced; derived caches (child
+    counts, ...) remember the version they were built for.
+    """
+
+    path: str = ""
+    view_full: pd.DataFrame = field(default_factory=pd.DataFrame)
+    issues: pd.DataFrame = field(default_factory=pd.DataFrame)
+    views_by_level: dict = field(default_factory=dict)
+    last_error: str = ""
+    last_regen: str = ""
+    version: int = 0
+    counts: dict = field(default_factory=dict)
+    counts_version: int = -1
+    search: dict = field(default_factory=dict)
+    search_version: int = -1
+    path_exists: bool = False
+    path_exists_key: tuple = ()
+    path_checked_at: float = 0.0
+    regen_in_progress: bool = False
+    regen_job: str = ""
+    regen_path: str = ""
+
+    # Mapping-style access kept for scripts/tests written against the old dict STATE.
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if key in _VIEW_FIELDS:
+            self.version += 1
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+STATE = AppState()
 
 # Parent chain (child level -> parent level)
 PARENT_LEVEL = {"C2": "C1", "C3": "C2", "C4": "C3"}
 
 
+def _child_counts(views_by_level: dict) -> dict[str, dict[str, int]]:
+    """Immediate-children counts per parent (canon ids), keyed by parent level."""
+    out: dict[str, dict[str, int]] = {"C1": {}, "C2": {}, "C3": {}}
+    for parent_level, child_level, parent_col in (
+        ("C1", "C2", "c1_human_id"),
+        ("C2", "C3", "c2_human_id"),
+        ("C3", "C4", "c3_human_id"),
+    ):
+        df = (views_by_level or {}).get(child_level)
+        if df is None or df.empty or parent_col not in df.columns:
+            continue
+        out[parent_level] = canon_series(df[parent_col]).value_counts().to_dict()
+    return out
+
+
+def _to_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert a frame to Arrow-backed dtypes when pyarrow is installed (optional)."""
+    if df is None or df.empty:
+        return df
+    try:
+        import pyarrow  # noqa: F401  # type: ignore
+    except Exception:
+        return df
+    return df.convert_dtypes(dtype_backend="pyarrow")
+
+
+# Background regeneration: a single worker, so regens run one at a time and
+# read endpoints keep serving the previous views meanwhile.
+_REGEN_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sar-regen")
+_REGEN_LOCK = threading.Lock()
+
+
+def _set_views(
+    view_full: pd.DataFrame, issues: pd.DataFrame, views_by_level: dict, *, path: str | None = None
+) -> None:
+    """Store freshly computed views in STATE (plus derived summaries).
+
+    Conversions and summaries are built first; the STATE fields (and `path`, if
+    given) are then swapped together under _REGEN_LOCK.
+    """
+    view_full = _to_arrow(view_full)
+    issues = _to_arrow(issues)
+    counts = _child_counts(views_by_level)
+    last_regen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _REGEN_LOCK:
+        if path is not None:
+            STATE.path = path
+        STATE.view_full = view_full
+        STATE.issues = issues
+        STATE.views_by_level = views_by_level
+        STATE.last_regen = last_regen
+        STATE.counts = counts
+        STATE.counts_version = STATE.version + 1
+        STATE.version += 1
+
+
+def _cached_child_counts() -> dict[str, dict[str, int]]:
+    """Return STATE child counts, rebuilding them if the views changed since they were built."""
+    if STATE.counts_version != STATE.version:
+        STATE.counts = _child_counts(STATE.views_by_level)
+        STATE.counts_version = STATE.version
+    return STATE.counts
+
+
+def _cached_search_text(key: str, df: pd.DataFrame, build=search_text) -> pd.DataFrame:
+    """Search frame `build(df)` for a STATE view (default: lower-cased text for `q`
+    searches), rebuilt when the views change."""
+    if STATE.search_version != STATE.version:
+        STATE.search = {}
+        STATE.search_version = STATE.version
+    hit = STATE.search.get(key)
+    # The frame identity guards against a regen swapping the view before `version` is bumped.
+    if hit is None or hit[0] is not df:
+        hit = STATE.search[key] = (df, build(df))
+    return hit[1]
+
+
+def _regen_job(path: str, job: str) -> None:
+    try:
+        view_full, issues, views_by_level = regenerate_views(path)
+        _set_views(view_full, issues, views_by_level, path=path)
+    except Exception as e:
+        STATE.last_error = str(e)
+    finally:
+        with _REGEN_LOCK:
+            if STATE.regen_job == job:
+                STATE.regen_in_progress = False
+
+
+def _submit_regen(path: str) -> str:
+    """Queue a view regeneration for `path` and return its job id.
+
+    A request for the path already being regenerated reuses the running job.
+    """
+    with _REGEN_LOCK:
+        if STATE.regen_in_progress and STATE.regen_path == path:
+            return STATE.regen_job
+        job = uuid.uuid4().hex[:12]
+        STATE.regen_in_progress = True
+        STATE.regen_job = job
+        STATE.regen_path = path
+    _REGEN_EXECUTOR.submit(_regen_job, path, job)
+    return job
+
+
 def _ensure_registry_loaded() -> bool:
-    return bool(STATE.get("path")) and os.path.exists(STATE["path"])
+    """True when a registry is loaded and its file exists.
+
+    The existence check is cached per (path, version) and re-done at most every
+    PATH_CHECK_TTL seconds, to notice files deleted behind our back.
+    """
+    if not STATE.path:
+        return False
+    key = (STATE.path, STATE.version)
+    now = time.monotonic()
+    if STATE.path_exists_key != key or now - STATE.path_checked_at > PATH_CHECK_TTL:
+        STATE.path_exists = os.path.exists(STATE.path)
+        STATE.path_exists_key = key
+        STATE.path_checked_at = now
+    return STATE.path_exists
+
+
+_SEMVER3_RE = re.compile(r"^(\d+)\.(\d+)\.(\d+)$")
+_SEMVER2_RE = re.compile(r"^(\d+)\.(\d+)$")
 
 
 def _bump_semver(v: str) -> str:
     """Bump patch of a semver-like string. Falls back to appending '.1'."""
     s = str(v or "").strip()
-    m = re.match(r"^(\d+)\.(\d+)\.(\d+)$", s)
+    m = _SEMVER3_RE.match(s)
     if m:
         a, b, c = int(m.group(1)), int(m.group(2)), int(m.group(3))
         return f"{a}.{b}.{c+1}"
-    m2 = re.match(r"^(\d+)\.(\d+)$", s)
+    m2 = _SEMVER2_RE.match(s)
     if m2:
         a, b = int(m2.group(1)), int(m2.group(2))
         return f"{a}.{b}.1"
@@ -117,12 +334,45 @@ def _bump_semver(v: str) -> str:
     return (s + ".1") if s else "0.1.0"
 
 
+# (template/registry file stats, state) for _schema_state
+_SCHEMA_STATE_CACHE: tuple[tuple, dict] = ((), {})
+
+
+def _file_stat_key(path: str) -> tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
 def _schema_state() -> dict:
-    """Compute schema/template compatibility state for UI banners."""
+    """Schema/template compatibility state for UI banners.
+
+    Rendered on every page, so the result is memoised on the (mtime, size) of
+    both workbooks; any write to either one (promote, migrate, add field) misses.
+    """
+    global _SCHEMA_STATE_CACHE
+    loaded = _ensure_registry_loaded()
+    key = (
+        str(TEMPLATE_PATH),
+        _file_stat_key(str(TEMPLATE_PATH)),
+        STATE.path if loaded else "",
+        _file_stat_key(STATE.path) if loaded else (0, 0),
+    )
+    cached_key, cached = _SCHEMA_STATE_CACHE
+    if cached_key == key:
+        return cached
+    out = _compute_schema_state(loaded)
+    _SCHEMA_STATE_CACHE = (key, out)
+    return out
+
+
+def _compute_schema_state(registry_loaded: bool) -> dict:
     out = {
         "template_exists": TEMPLATE_PATH.exists(),
         "template_path": str(TEMPLATE_PATH),
-        "registry_path": STATE.get("path", ""),
+        "registry_path": STATE.path,
         "status": "no_template",
         "template_schema_version": "",
         "registry_schema_version": "",
@@ -137,16 +387,16 @@ def _schema_state() -> dict:
     tmeta = read_meta_dict(str(TEMPLATE_PATH))
     out["template_schema_version"] = tmeta.get("schema_version") or tmeta.get("template_version", "")
 
-    if not _ensure_registry_loaded():
+    if not registry_loaded:
         out["status"] = "template_only"
         return out
 
-    rmeta = read_meta_dict(STATE["path"])
+    rmeta = read_meta_dict(STATE.path)
     out["registry_schema_version"] = rmeta.get("schema_version") or rmeta.get("template_version", "")
 
     # Schema maps
     tmap = get_schema_map(str(TEMPLATE_PATH), SCHEMA_SHEETS)
-    rmap = get_schema_map(STATE["path"], SCHEMA_SHEETS)
+    rmap = get_schema_map(STATE.path, SCHEMA_SHEETS)
 
     # Diff (normalised headers)
     added = {}
@@ -188,16 +438,115 @@ def _render(request: Request, template_name: str, ctx: dict):
 
 
 
+# SAR-style timestamp prefix: YYYYMMDD_HHMMSS__name.xlsx
+_TS_RE = re.compile(r"^(\d{8}_\d{6})__.+\.xlsx$")
+
+# (DATA_DIR mtime_ns, newest xlsx path)
+_LAST_XLSX_CACHE: tuple[int, str] = (0, "")
+
+
+def _paginate(request: Request, df: pd.DataFrame, page: int, page_size: int) -> tuple[pd.DataFrame, dict]:
+    """Slice a filtered frame to one page and build pager info for templates."""
+    total = int(len(df)) if df is not None else 0
+    size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    pages = max(1, (total + size - 1) // size)
+    cur = max(0, min(int(page or 0), pages - 1))
+
+    def _url(p: int) -> str:
+        params = dict(request.query_params)
+        params["page"] = str(p)
+        params["page_size"] = str(size)
+        return f"{request.url.path}?{urlencode(params)}"
+
+    pager = {
+        "page": cur,
+        "page_size": size,
+        "pages": pages,
+        "total": total,
+        "first_row": cur * size + 1 if total else 0,
+        "last_row": min(total, (cur + 1) * size),
+        "prev_url": _url(cur - 1) if cur > 0 else "",
+        "next_url": _url(cur + 1) if cur < pages - 1 else "",
+    }
+    if df is None or df.empty:
+        return df, pager
+    return df.iloc[cur * size : (cur + 1) * size], pager
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    """Row dicts for templates, like df.to_dict(orient="records") but built from
+    one tolist() per column (about 35% faster on the issues table)."""
+    cols = df.columns.tolist()
+    return [dict(zip(cols, row)) for row in zip(*(df[c].tolist() for c in cols))]
+
+
+_VIEW_FULL_GROUPS = ("c1", "c2", "c3", "c4")
+
+
+def _view_full_table(df: pd.DataFrame) -> tuple[list[dict], list[dict], list[tuple]]:
+    """Lay out VIEW_Full for the template: (group headers, columns, rows).
+
+    Columns are ordered C1..C4 then the rest, each with its label and block
+    separator precomputed; rows are value tuples in that order, so the template
+    does no per-cell key lookups or grouping logic.
+    """
+    if df is None or df.empty:
+        return [], [], []
+
+    by_group: dict[str, list[str]] = {g: [] for g in _VIEW_FULL_GROUPS + ("other",)}
+    for c in df.columns:
+        g = c[:2] if c[:2] in _VIEW_FULL_GROUPS and c[2:4] == "__" else "other"
+        by_group[g].append(c)
+
+    groups: list[dict] = []
+    columns: list[dict] = []
+    for g, cols in by_group.items():
+        if not cols:
+            continue
+        if g == "c1":
+            css = "grp c1"
+        elif g == "other":
+            css = "grp sep-left-strong"
+        else:
+            css = f"grp {g} sep-left-strong"
+        groups.append({"css": css, "label": g.upper() if g != "other" else "", "span": len(cols)})
+        for i, c in enumerate(cols):
+            label = c.replace("c1__", "").replace("c2__", "").replace("c3__", "").replace("c4__", "")
+            columns.append(
+                {
+                    "name": c,
+                    "label": label,
+                    "sep": i == 0 and g != "c1",
+                    "is_hid": c.endswith("__human_id"),
+                }
+            )
+
+    rows = list(zip(*(df[c["name"]].tolist() for c in columns)))
+    return groups, columns, rows
+
+
 def _latest_xlsx_in_data_dir() -> str:
-    """Return absolute path of the newest .xlsx in /data (by filename timestamp if present, else mtime)."""
-    if not DATA_DIR.exists():
+    """Return absolute path of the newest .xlsx in /data (by filename timestamp if present, else mtime).
+
+    The result is cached until the directory mtime changes (file added/removed/renamed).
+    """
+    global _LAST_XLSX_CACHE
+    try:
+        dir_mtime = DATA_DIR.stat().st_mtime_ns
+    except OSError:
         return ""
+
+    cached_mtime, cached_value = _LAST_XLSX_CACHE
+    if cached_mtime and dir_mtime == cached_mtime:
+        return cached_value
+
     candidates = [p for p in DATA_DIR.glob("*.xlsx") if p.is_file()]
     if not candidates:
+        _LAST_XLSX_CACHE = (dir_mtime, "")
         return ""
-    # Prefer SAR-style timestamp prefix: YYYYMMDD_HHMMSS__name.xlsx
+    # Prefer SAR-style timestamp prefix
     def sort_key(p: Path):
-        m = re.match(r"^(\d{8}_\d{6})__.+\.xlsx$", p.name)
+        m = _TS_RE.match(p.name)
         if m:
             try:
                 dt = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S")
@@ -206,58 +555,67 @@ def _latest_xlsx_in_data_dir() -> str:
                 pass
         return (0, p.stat().st_mtime)
 
-    newest = max(candidates, key=sort_key)
-    return str(newest.resolve())
+    newest = str(max(candidates, key=sort_key).resolve())
+    _LAST_XLSX_CACHE = (dir_mtime, newest)
+    return newest
+
+
+def _parent_search_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Autocomplete index for a parent view: canon id, lower-cased name and label per row."""
+    human_id = df["human_id"].fillna("").astype(str).str.strip()
+    name = df["name"].fillna("").astype(str).str.strip() if "name" in df.columns else pd.Series("", index=df.index)
+    label = (human_id + " — " + name).where(name != "", human_id)
+    return pd.DataFrame(
+        {
+            "hid": canon_series(df["human_id"]),
+            "name": df["name"].astype(str).str.lower() if "name" in df.columns else "",
+            "human_id": human_id,
+            "label": label,
+        },
+        index=df.index,
+    )
 
 
 def _search_parent_candidates(*, child_level: str, q: str, limit: int = 20):
     """Search existing parents for a given child level.
 
-    Results are returned from in-memory views when available; falls back to reading the
-    corresponding sheet if needed.
+    Results are returned from in-memory views when available (through an index
+    cached per view); falls back to reading the corresponding sheet if needed.
     """
     cl = str(child_level or "").strip().upper()
     parent_level = PARENT_LEVEL.get(cl, "")
     if not parent_level:
         return []
 
-    df = (STATE.get("views_by_level", {}) or {}).get(parent_level)
+    q_raw = (q or "").strip()
+    if not q_raw:
+        return []
+
+    df = (STATE.views_by_level or {}).get(parent_level)
     if df is None or df.empty or "human_id" not in df.columns:
         pm = meta_for_level(parent_level)
         if not pm:
             return []
-        df = read_sheet(STATE["path"], pm["sheet"])
-
-    # Ensure columns exist
-    if "name" not in df.columns:
-        df = df.copy()
-        df["name"] = ""
-
-    q_raw = (q or "").strip()
-    if not q_raw:
-        return []
+        df = read_sheet(STATE.path, pm["sheet"])
+        if "human_id" not in df.columns:
+            return []
+        idx = _parent_search_frame(df)
+    else:
+        idx = _cached_search_text(f"parents:{parent_level}", df, _parent_search_frame)
 
     ql = q_raw.lower()
     qcanon = canon(q_raw)
 
-    tmp = df[["human_id", "name"]].copy()
-    tmp["__hid"] = tmp["human_id"].astype(str).map(canon)
-    tmp["__name"] = tmp["name"].astype(str).str.lower()
-    hit = tmp[(tmp["__hid"].str.contains(qcanon)) | (tmp["__name"].str.contains(ql))]
+    hids = idx["hid"]
+    hit = idx[(hids.str.contains(qcanon, regex=False) | idx["name"].str.contains(ql, regex=False)).to_numpy(dtype=bool)]
 
     # Prefer exact-ish matches first
-    hit["__rank"] = 2
-    hit.loc[hit["__hid"] == qcanon, "__rank"] = 0
-    hit.loc[hit["__hid"].str.startswith(qcanon), "__rank"] = 1
-    hit = hit.sort_values(by=["__rank", "__hid"]).head(max(1, min(int(limit or 20), 50)))
-
-    out = []
-    for _, r in hit.iterrows():
-        hid = str(r.get("human_id", "") or "").strip()
-        name = str(r.get("name", "") or "").strip()
-        label = hid if not name else f"{hid} — {name}"
-        out.append({"human_id": hid, "label": label})
-    return out
+    hit_ids = hit["hid"].to_numpy(dtype=object)
+    rank = np.where(hit_ids == qcanon, 0, np.where(hit["hid"].str.startswith(qcanon).to_numpy(dtype=bool), 1, 2))
+    order = np.lexsort((hit_ids, rank))[: max(1, min(int(limit or 20), 50))]
+
+    top = hit.iloc[order]
+    return [{"human_id": h, "label": lbl} for h, lbl in zip(top["human_id"], top["label"])]
 
 
 # ------------------ Routes ------------------
@@ -267,7 +625,7 @@ def _search_parent_candidates(*, child_level: str, q: str, limit: int = 20):
 def login_get(request: Request, next: str = "/"):
     if getattr(request.state, "user", None):
         return RedirectResponse(url=next or "/", status_code=303)
-    return _render(request, "login.html", {"path": STATE.get("path", ""), "next": next, "error": ""})
+    return _render(request, "login.html", {"path": STATE.path, "next": next, "error": ""})
 
 
 @app.post("/login")
@@ -279,7 +637,7 @@ def login_post(
 ):
     u = authenticate(username=username, password=password)
     if not u:
-        return _render(request, "login.html", {"path": STATE.get("path", ""), "next": next, "error": "Credenciales inválidas"})
+        return _render(request, "login.html", {"path": STATE.path, "next": next, "error": "Credenciales inválidas"})
     token = sign_session(u.username)
     resp = RedirectResponse(url=(next or "/"), status_code=303)
     resp.set_cookie(
@@ -300,12 +658,12 @@ def logout_post(request: Request):
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request, user=Depends(require_user)):
-    view_rows = int(len(STATE["view_full"])) if STATE["view_full"] is not None else 0
-    issues_errors = safe_count(STATE["issues"], "severity", "error")
-    issues_warnings = safe_count(STATE["issues"], "severity", "warning")
+    view_rows = int(len(STATE.view_full)) if STATE.view_full is not None else 0
+    issues_errors = safe_count(STATE.issues, "severity", "error")
+    issues_warnings = safe_count(STATE.issues, "severity", "warning")
 
-    has_data = (STATE["view_full"] is not None and not STATE["view_full"].empty) or (
-        STATE["issues"] is not None and not STATE["issues"].empty
+    has_data = (STATE.view_full is not None and not STATE.view_full.empty) or (
+        STATE.issues is not None and not STATE.issues.empty
     )
 
     return _render(
@@ -313,13 +671,14 @@ def home(request: Request, user=Depends(require_user)):
         "index.html",
         {
             "request": request,
-            "path": STATE["path"],
+            "path": STATE.path,
             "has_data": has_data,
             "view_rows": view_rows,
             "issues_errors": issues_errors,
             "issues_warnings": issues_warnings,
-            "last_error": STATE.get("last_error", ""),
-            "last_regen": STATE.get("last_regen", ""),
+            "last_error": STATE.last_error,
+            "last_regen": STATE.last_regen,
+            "regen_in_progress": STATE.regen_in_progress,
             "last_data_registry": _latest_xlsx_in_data_dir(),
         },
     )
@@ -328,68 +687,45 @@ def home(request: Request, user=Depends(require_user)):
 
 @app.get("/open-last")
 def open_last(user=Depends(require_user)):
-    """Load the newest registry found in /data and regenerate views."""
-    STATE["last_error"] = ""
+    """Load the newest registry found in /data and regenerate views in the background."""
+    STATE.last_error = ""
     try:
         p = _latest_xlsx_in_data_dir()
         if not p:
             raise ValueError("No se ha encontrado ningún .xlsx en /data.")
-        STATE["path"] = p
-        view_full, issues, views_by_level = regenerate_views(STATE["path"])
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        return RedirectResponse(url="/view-full", status_code=303)
+        _submit_regen(p)
+        return RedirectResponse(url="/", status_code=303)
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url="/", status_code=303)
 
 
 @app.post("/registry/reset-from-template")
 def reset_registry_from_template(user=Depends(require_role("admin"))):
     """Create a fresh registry in /data from the base template and open it."""
-    STATE["last_error"] = ""
+    STATE.last_error = ""
     try:
         if not TEMPLATE_PATH.exists():
             raise ValueError("No existe la plantilla base (registry_template.xlsx).")
 
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         out_path = DATA_DIR / f"{ts}__registry.xlsx"
-        shutil.copy2(TEMPLATE_PATH, out_path)
-
-        # Stamp meta on the new registry
-        tmeta = read_meta_dict(str(TEMPLATE_PATH))
-        base_ver = tmeta.get("schema_version") or tmeta.get("template_version", "")
-        tmap = get_schema_map(str(TEMPLATE_PATH), SCHEMA_SHEETS)
-        th = schema_hash(tmap)
-        write_meta_kv(
-            str(out_path),
-            {
-                "schema_version": base_ver,
-                "schema_hash": th,
-                "schema_base_version": base_ver,
-                "schema_dirty": "no",
-                "last_modified": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            },
-        )
+        # Template copy with META stamped, in a single save
+        create_registry_from_template(str(TEMPLATE_PATH), str(out_path), schema_sheets=SCHEMA_SHEETS)
 
-        STATE["path"] = str(out_path.resolve())
-        view_full, issues, views_by_level = regenerate_views(STATE["path"])
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new_path = str(out_path.resolve())
+        view_full, issues, views_by_level = regenerate_views(new_path)
+        _set_views(view_full, issues, views_by_level, path=new_path)
         return RedirectResponse(url="/", status_code=303)
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url="/", status_code=303)
 
 
 @app.post("/template/promote")
 def promote_registry_schema_to_template(user=Depends(require_role("admin"))):
     """Promote columns present in the active registry but missing in the template."""
-    STATE["last_error"] = ""
+    STATE.last_error = ""
     try:
         if not TEMPLATE_PATH.exists():
             raise ValueError("No existe la plantilla base (registry_template.xlsx).")
@@ -422,14 +758,14 @@ def promote_registry_schema_to_template(user=Depends(require_role("admin"))):
 
         return RedirectResponse(url="/", status_code=303)
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url="/", status_code=303)
 
 
 @app.post("/template/migrate-registry")
 def migrate_registry_to_template_schema(user=Depends(require_role("admin"))):
     """Add to the active registry any columns that exist in the template but are missing in the registry."""
-    STATE["last_error"] = ""
+    STATE.last_error = ""
     try:
         if not TEMPLATE_PATH.exists():
             raise ValueError("No existe la plantilla base (registry_template.xlsx).")
@@ -439,15 +775,15 @@ def migrate_registry_to_template_schema(user=Depends(require_role("admin"))):
         st = _schema_state()
         if st.get("missing"):
             for sh, cols in st["missing"].items():
-                add_missing_columns(STATE["path"], sh, cols)
+                add_missing_columns(STATE.path, sh, cols)
 
         # Sync schema meta into registry
         tmeta = read_meta_dict(str(TEMPLATE_PATH))
         base_ver = tmeta.get("schema_version") or tmeta.get("template_version", "")
-        rmap = get_schema_map(STATE["path"], SCHEMA_SHEETS)
+        rmap = get_schema_map(STATE.path, SCHEMA_SHEETS)
         rh = schema_hash(rmap)
         write_meta_kv(
-            STATE["path"],
+            STATE.path,
             {
                 "schema_version": base_ver,
                 "schema_hash": rh,
@@ -457,15 +793,12 @@ def migrate_registry_to_template_schema(user=Depends(require_role("admin"))):
         )
 
         # Regenerate views after structural change
-        view_full, issues, views_by_level = regenerate_views(STATE["path"])
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        view_full, issues, views_by_level = regenerate_views(STATE.path)
+        _set_views(view_full, issues, views_by_level)
 
         return RedirectResponse(url="/", status_code=303)
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url="/", status_code=303)
 
 
@@ -475,7 +808,7 @@ async def regenerate(
     file: UploadFile | None = File(None),
     user=Depends(require_role("editor")),
 ):
-    STATE["last_error"] = ""
+    STATE.last_error = ""
     try:
         chosen_path = ""
 
@@ -487,8 +820,10 @@ async def regenerate(
             safe_name = Path(file.filename).name
             out_path = DATA_DIR / f"{ts}__{safe_name}"
 
-            content = await file.read()
-            out_path.write_bytes(content)
+            # Stream to disk in chunks (avoid buffering the whole workbook in memory)
+            with out_path.open("wb") as out:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    out.write(chunk)
             chosen_path = str(out_path.resolve())
         else:
             p = (path or "").strip()
@@ -498,19 +833,27 @@ async def regenerate(
                 raise ValueError("La ruta indicada no existe.")
             chosen_path = p
 
-        STATE["path"] = chosen_path
-        view_full, issues, views_by_level = regenerate_views(STATE["path"])
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        return RedirectResponse(url="/view-full", status_code=303)
+        _submit_regen(chosen_path)
+        return RedirectResponse(url="/", status_code=303)
 
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url="/", status_code=303)
 
+
+@app.get("/regen/status")
+def regen_status(user=Depends(require_user)):
+    """Progress of the background regeneration (polled by the home page)."""
+    return JSONResponse(
+        {
+            "job": STATE.regen_job,
+            "in_progress": STATE.regen_in_progress,
+            "path": STATE.regen_path,
+            "error": STATE.last_error,
+            "last_regen": STATE.last_regen,
+        }
+    )
+
 @app.get("/view-full", response_class=HTMLResponse)
 def view_full(
     request: Request,
@@ -523,11 +866,15 @@ def view_full(
     vuln_c2: str = "",
     vuln_c3: str = "",
     vuln_c4: str = "",
+    page: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE,
 ):
     # Base DF (prefijado, dinámico)
-    df = STATE["view_full"].copy() if STATE["view_full"] is not None else pd.DataFrame()
+    df = STATE.view_full if STATE.view_full is not None else pd.DataFrame()
+    filters = (q, exposure, internet_exposure, status, vuln_c1, vuln_c2, vuln_c3, vuln_c4)
 
-    if not df.empty:
+    # No filters (the common dashboard case): page straight off the snapshot.
+    if not df.empty and any(filters):
         # Para no depender de cambios en templates:
         # - mantenemos parámetros q/exposure/internet_exposure/status
         # - filtramos sobre columnas prefijadas si existen
@@ -536,42 +883,44 @@ def view_full(
         # runtime status: en excel suele ser "status" en C4 -> "c4__status"
         status_col = first_existing_col(df, "c4__status", "runtime_status", "status")
 
+        # All filters AND into one row mask, so the wide frame is subset once.
+        mask = np.ones(len(df), dtype=bool)
         if q:
-            ql = q.lower()
-            mask = df.apply(lambda r: ql in " ".join([str(x).lower() for x in r.values]), axis=1)
-            df = df[mask]
-
-        if exposure and exposure_col:
-            df = df[df[exposure_col] == exposure]
-
-        if internet_exposure and internet_col:
-            df = df[df[internet_col] == internet_exposure]
-
-        if status and status_col:
-            df = df[df[status_col] == status]
-
-        # vulnerabilities_detected filters (by level)
-        def _apply_vuln_filter(param: str, colname: str):
-            nonlocal df
-            if param and colname in df.columns:
-                df = df[df[colname] == param]
-
-        _apply_vuln_filter(vuln_c1, "c1__vulnerabilities_detected")
-        _apply_vuln_filter(vuln_c2, "c2__vulnerabilities_detected")
-        _apply_vuln_filter(vuln_c3, "c3__vulnerabilities_detected")
-        _apply_vuln_filter(vuln_c4, "c4__vulnerabilities_detected")
+            mask &= text_search_mask(df, q, lowered=_cached_search_text("full", df)).to_numpy()
+
+        equals = [
+            (exposure, exposure_col),
+            (internet_exposure, internet_col),
+            (status, status_col),
+            # vulnerabilities_detected filters (by level)
+            (vuln_c1, "c1__vulnerabilities_detected"),
+            (vuln_c2, "c2__vulnerabilities_detected"),
+            (vuln_c3, "c3__vulnerabilities_detected"),
+            (vuln_c4, "c4__vulnerabilities_detected"),
+        ]
+        for value, col in equals:
+            if value and col and col in df.columns:
+                mask &= (df[col] == value).to_numpy(dtype=bool)
+
+        df = df[mask]
 
         # Nota: anteriormente se añadían aliases sin prefijo (exposure/internet_exposure/runtime_status)
         # para compatibilidad con templates antiguos. Ya no es necesario y generaba columnas redundantes
         # al final de la tabla en VIEW_Full.
 
+    df, pager = _paginate(request, df, page, page_size)
+    groups, columns, rows = _view_full_table(df)
+
     return _render(
         request,
         "view_full.html",
         {
             "request": request,
-            "path": STATE["path"],
-            "rows": df.to_dict(orient="records"),
+            "path": STATE.path,
+            "groups": groups,
+            "columns": columns,
+            "rows": rows,
+            "pager": pager,
             "q": q,
             "exposure": exposure,
             "internet_exposure": internet_exposure,
@@ -610,9 +959,9 @@ def issues(
     level: str = "",
     issue_type: str = "",
 ):
-    df = STATE["issues"].copy() if STATE["issues"] is not None else pd.DataFrame()
+    df = STATE.issues if STATE.issues is not None else pd.DataFrame()
 
-    if not df.empty:
+    if not df.empty and any((severity, level, issue_type)):
         if severity and "severity" in df.columns:
             df = df[df["severity"] == severity]
         if level and "level" in df.columns:
@@ -625,8 +974,8 @@ def issues(
         "issues.html",
         {
             "request": request,
-            "path": STATE["path"],
-            "rows": df.to_dict(orient="records"),
+            "path": STATE.path,
+            "rows": _records(df),
             "severity": severity,
             "level": level,
             "issue_type": issue_type,
@@ -647,6 +996,8 @@ def list_level(
     orphan: str = "",  # "1" => only orphans
     view: str = "compact",  # compact|full
     vulnerabilities_detected: str = "",
+    page: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE,
     user=Depends(require_user),
 ):
     """List all records for a given level (C1..C4).
@@ -659,84 +1010,75 @@ def list_level(
 
     meta = meta_for_level(level)
     if not meta:
-        STATE["last_error"] = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
+        STATE.last_error = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
         return RedirectResponse(url="/", status_code=303)
 
-    path = STATE["path"]
+    path = STATE.path
     sheet = meta["sheet"]
     parent_col = meta.get("parent_col")  # None for C1
     level_code = meta["level"]
 
-    # Use derived view from engine (never raw Excel)
-    df = (STATE.get("views_by_level", {}) or {}).get(level_code)
+    parent_level = {"C2": "C1", "C3": "C2", "C4": "C3"}.get(level_code, "") if parent_col else ""
+    pm = meta_for_level(parent_level) if parent_level else None
+
+    # Use derived views from engine (never raw Excel): the level view, and the
+    # parent view for its ids (level views keep every sheet row, orphans included).
+    # Whatever is missing is read from the workbook in a single open.
+    df = (STATE.views_by_level or {}).get(level_code)
+    from_state = df is not None
+    pdf = (STATE.views_by_level or {}).get(parent_level) if pm else None
+    wanted: dict[str, list[str] | None] = {}
     if df is None:
-        df = read_sheet(path, sheet)
+        wanted[sheet] = None
+    if pm and pdf is None:
+        wanted.setdefault(pm["sheet"], ["human_id"])
+    sheets = read_sheets(path, wanted) if wanted else {}
+    if df is None:
+        df = sheets[sheet]
+    if pm and pdf is None:
+        pdf = sheets.get(pm["sheet"])
 
     # Stable/common columns (if present)
     status_col = first_existing_col(df, "status")
     name_col = first_existing_col(df, "name")
 
     # --- Orphan detection (only when a parent is expected)
-    parent_ids = set()
-    if parent_col:
-        parent_level = {"C2": "C1", "C3": "C2", "C4": "C3"}.get(level_code, "")
-        pm = meta_for_level(parent_level) if parent_level else None
-        if pm:
-            pdf = read_sheet(path, pm["sheet"])
-            if pdf is not None and not pdf.empty and "human_id" in pdf.columns:
-                parent_ids = set(pdf["human_id"].astype(str).map(canon).tolist())
-
-    # --- Immediate children counts (fast summaries)
-    counts_c2_by_c1 = {}
-    counts_c3_by_c2 = {}
-    counts_c4_by_c3 = {}
-
-    if level_code in ("C1",):
-        c2 = read_sheet(path, "C2_Aplicaciones")
-        if c2 is not None and not c2.empty and "c1_human_id" in c2.columns:
-            counts_c2_by_c1 = (
-                c2.assign(__k=c2["c1_human_id"].astype(str).map(canon)).groupby("__k").size().to_dict()
-            )
-
-    if level_code in ("C2",):
-        c3 = read_sheet(path, "C3_Componentes")
-        if c3 is not None and not c3.empty and "c2_human_id" in c3.columns:
-            counts_c3_by_c2 = (
-                c3.assign(__k=c3["c2_human_id"].astype(str).map(canon)).groupby("__k").size().to_dict()
-            )
+    parent_ids: set[str] = set()
+    if pm and pdf is not None and not pdf.empty and "human_id" in pdf.columns:
+        parent_ids = set(canon_series(pdf["human_id"]).tolist())
 
-    if level_code in ("C3",):
-        c4 = read_sheet(path, "C4_Runtime")
-        if c4 is not None and not c4.empty and "c3_human_id" in c4.columns:
-            counts_c4_by_c3 = (
-                c4.assign(__k=c4["c3_human_id"].astype(str).map(canon)).groupby("__k").size().to_dict()
-            )
+    # --- Immediate children counts (precomputed on regenerate)
+    counts = _cached_child_counts()
+    counts_c2_by_c1 = counts.get("C1", {})
+    counts_c3_by_c2 = counts.get("C2", {})
+    counts_c4_by_c3 = counts.get("C3", {})
 
     # --- Filtering
-    out = df.copy() if df is not None else pd.DataFrame()
+    out = df if df is not None else pd.DataFrame()
     if not out.empty:
+        # All filters AND into one row mask, so the frame is subset once.
+        mask = np.ones(len(out), dtype=bool)
         if q:
-            ql = q.lower()
-            mask = out.apply(lambda r: ql in " ".join([str(x).lower() for x in r.values]), axis=1)
-            out = out[mask]
+            lowered = _cached_search_text(level_code, out) if from_state else None
+            mask &= text_search_mask(out, q, lowered=lowered).to_numpy()
 
         if status and status_col:
-            out = out[out[status_col].astype(str) == status]
+            mask &= (out[status_col].astype(str) == status).to_numpy(dtype=bool)
 
         if vulnerabilities_detected and "vulnerabilities_detected" in out.columns:
-            out = out[out["vulnerabilities_detected"].astype(str) == vulnerabilities_detected]
-
-        # Optional: filter by explicit parent reference (contextual navigation)
-        if parent and parent_col and parent_col in out.columns:
-            p = canon(parent)
-            out = out[out[parent_col].astype(str).map(canon) == p]
+            mask &= (out["vulnerabilities_detected"].astype(str) == vulnerabilities_detected).to_numpy(dtype=bool)
 
+        orphans = np.zeros(len(out), dtype=bool)
         if parent_col and parent_col in out.columns:
-            out["__orphan"] = ~out[parent_col].astype(str).map(canon).isin(parent_ids)
+            parents = canon_series(out[parent_col])
+            # Optional: filter by explicit parent reference (contextual navigation)
+            if parent:
+                mask &= (parents == canon(parent)).to_numpy(dtype=bool)
+            orphans = ~isin_ids(parents, parent_ids)
             if orphan == "1":
-                out = out[out["__orphan"] == True]
-        else:
-            out["__orphan"] = False
+                mask &= orphans
+
+        out = out[mask].assign(__orphan=orphans[mask])
 
     # --- Columns to show
     base_cols = [c for c in ["human_id", name_col, status_col, parent_col] if c]
@@ -776,22 +1118,28 @@ def list_level(
                 break
         columns = base_cols + preferred
 
-    # --- Build rows payload
+    # --- Build rows payload (current page only)
+    out, pager = _paginate(request, out, page, page_size)
     rows = []
     if out is not None and not out.empty:
-        for _, r in out.iterrows():
-            hid = canon(str(r.get("human_id", "")))
-            cnt_c2 = int(counts_c2_by_c1.get(hid, 0)) if level_code == "C1" else 0
-            cnt_c3 = int(counts_c3_by_c2.get(hid, 0)) if level_code == "C2" else 0
-            cnt_c4 = int(counts_c4_by_c3.get(hid, 0)) if level_code == "C3" else 0
+        # Column-wise: avoid boxing every row into a Series (iterrows)
+        if "human_id" in out.columns:
+            hids = canon_series(out["human_id"]).tolist()
+        else:
+            hids = [""] * len(out)
+        orphans = out["__orphan"].astype(bool).tolist() if "__orphan" in out.columns else [False] * len(out)
+        child_counts = {"C1": counts_c2_by_c1, "C2": counts_c3_by_c2, "C3": counts_c4_by_c3}.get(level_code, {})
+        cnts = [int(child_counts.get(h, 0)) for h in hids]
+        records = _records(out.reindex(columns=columns, fill_value=""))
+        for hid, is_orphan, cnt, rec in zip(hids, orphans, cnts, records):
             rows.append(
                 {
                     "__human_id": hid,
-                    "__orphan": bool(r.get("__orphan", False)),
-                    "__cnt_c2": cnt_c2,
-                    "__cnt_c3": cnt_c3,
-                    "__cnt_c4": cnt_c4,
-                    **{c: r.get(c, "") for c in columns},
+                    "__orphan": is_orphan,
+                    "__cnt_c2": cnt if level_code == "C1" else 0,
+                    "__cnt_c3": cnt if level_code == "C2" else 0,
+                    "__cnt_c4": cnt if level_code == "C3" else 0,
+                    **rec,
                 }
             )
 
@@ -813,6 +1161,7 @@ def list_level(
             "view": view,
             "show_all": show_all,
             "vulnerabilities_detected": vulnerabilities_detected,
+            "pager": pager,
         },
     )
 
@@ -824,17 +1173,17 @@ def record(request: Request, human_id: str, user=Depends(require_user)):
 
     meta = detect_level_meta(human_id)
     if not meta:
-        STATE["last_error"] = f"human_id '{human_id}' no reconocido (prefijo no soportado)."
+        STATE.last_error = f"human_id '{human_id}' no reconocido (prefijo no soportado)."
         return RedirectResponse(url="/", status_code=303)
 
-    path = STATE["path"]
+    path = STATE.path
     sheet = meta["sheet"]
     level = meta["level"]
     df = read_sheet(path, sheet)
-    row = get_row_by_human_id(df, human_id)
+    row = get_row_by_human_id(df, human_id, index=sheet_hid_index(path, sheet))
 
     if not row:
-        STATE["last_error"] = f"No se encontró '{human_id}' en la pestaña '{sheet}'."
+        STATE.last_error = f"No se encontró '{human_id}' en la pestaña '{sheet}'."
         return RedirectResponse(url="/", status_code=303)
 
     # Parent
@@ -853,13 +1202,13 @@ def record(request: Request, human_id: str, user=Depends(require_user)):
     descendant_counts = list_descendants_counts(path, level, human_id)
 
     # Issues for this id
-    issues_rows = issues_for(STATE["issues"], human_id)
+    issues_rows = issues_for(STATE.issues, human_id)
 
     # Overlay derived fields for display (e.g., inherited vulnerabilities_detected)
     display_record = dict(row)
-    ddf = (STATE.get("views_by_level", {}) or {}).get(level)
+    ddf = (STATE.views_by_level or {}).get(level)
     if ddf is not None and not ddf.empty and "human_id" in ddf.columns:
-        match = ddf[ddf["human_id"].astype(str).map(canon) == canon(human_id)]
+        match = ddf[canon_series(ddf["human_id"]) == canon(human_id)]
         if not match.empty and "vulnerabilities_detected" in match.columns:
             display_record["vulnerabilities_detected"] = str(match.iloc[0].get("vulnerabilities_detected", ""))
 
@@ -920,7 +1269,7 @@ def record(request: Request, human_id: str, user=Depends(require_user)):
             "mermaid_code": mermaid_code,
             "diagram_meta": diagram_meta,
             "mermaid_error": mermaid_error,
-            "last_error": STATE.get("last_error",""),
+            "last_error": STATE.last_error,
         },
     )
 
@@ -948,19 +1297,16 @@ async def edit_record_existing_fields(request: Request, human_id: str, user=Depe
             return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
         view_full, issues, views_by_level = update_record_existing_fields(
-            path=STATE["path"],
+            path=STATE.path,
             human_id=human_id,
             fields=fields,
         )
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        STATE["last_error"] = ""
+        _set_views(view_full, issues, views_by_level)
+        STATE.last_error = ""
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
 
@@ -979,11 +1325,11 @@ async def preview_add_field(request: Request, human_id: str, user=Depends(requir
         value = "" if form.get("value") is None else str(form.get("value"))
 
         if not field_name:
-            STATE["last_error"] = "El nombre del campo no puede estar vacío."
+            STATE.last_error = "El nombre del campo no puede estar vacío."
             return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
         # Render a confirmation page (two-step confirmation)
-        STATE["last_error"] = ""
+        STATE.last_error = ""
         return _render(
             request,
             "add_field_confirm.html",
@@ -995,7 +1341,7 @@ async def preview_add_field(request: Request, human_id: str, user=Depends(requir
             },
         )
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
 
@@ -1011,24 +1357,21 @@ async def confirm_add_field(request: Request, human_id: str, user=Depends(requir
         value = "" if form.get("value") is None else str(form.get("value"))
 
         if not field_name:
-            STATE["last_error"] = "El nombre del campo no puede estar vacío."
+            STATE.last_error = "El nombre del campo no puede estar vacío."
             return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
         view_full, issues, views_by_level = add_new_field(
-            path=STATE["path"],
+            path=STATE.path,
             human_id=human_id,
             field_name=field_name,
             value=value,
         )
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        STATE["last_error"] = ""
+        _set_views(view_full, issues, views_by_level)
+        STATE.last_error = ""
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
 
@@ -1043,9 +1386,9 @@ async def report_c4_docx(request: Request, human_id: str, user=Depends(require_u
         return JSONResponse({"error": "Solo disponible para registros C4 (RUN-xxxx)."}, status_code=400)
 
     # Ensure we have issues computed (report relies on them). If not available, regenerate.
-    if STATE.get("issues") is None or getattr(STATE.get("issues"), "empty", True):
+    if STATE.issues is None or getattr(STATE.issues, "empty", True):
         try:
-            regenerate_views(STATE["path"], STATE)
+            regenerate_views(STATE.path, STATE)
         except Exception:
             pass
 
@@ -1056,9 +1399,9 @@ async def report_c4_docx(request: Request, human_id: str, user=Depends(require_u
 
     try:
         out_docx = generate_c4_chain_report_docx(
-            registry_path=STATE["path"],
+            registry_path=STATE.path,
             run_human_id=run_id,
-            issues_df=STATE.get("issues"),
+            issues_df=STATE.issues,
             template_docx_path=str(REPORT_TEMPLATE_DOCX),
             out_dir=str(REPORTS_DIR),
             max_nodes=max_nodes,
@@ -1093,9 +1436,9 @@ async def report_c4_html(request: Request, human_id: str, user=Depends(require_u
         return JSONResponse({"error": "Solo disponible para registros C4 (RUN-xxxx)."}, status_code=400)
 
     # Ensure we have issues computed (report relies on them). If not available, regenerate.
-    if STATE.get("issues") is None or getattr(STATE.get("issues"), "empty", True):
+    if STATE.issues is None or getattr(STATE.issues, "empty", True):
         try:
-            regenerate_views(STATE["path"], STATE)
+            regenerate_views(STATE.path, STATE)
         except Exception:
             pass
 
@@ -1106,9 +1449,9 @@ async def report_c4_html(request: Request, human_id: str, user=Depends(require_u
 
     try:
         out_html = generate_c4_chain_report_html(
-            registry_path=STATE["path"],
+            registry_path=STATE.path,
             run_human_id=run_id,
-            issues_df=STATE.get("issues"),
+            issues_df=STATE.issues,
             template_html_path=str(REPORT_TEMPLATE_HTML),
             out_dir=str(REPORTS_DIR),
             max_nodes=max_nodes,
@@ -1138,11 +1481,11 @@ def create_form(request: Request, level: str, parent: str = "", user=Depends(req
 
     meta = meta_for_level(level)
     if not meta:
-        STATE["last_error"] = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
+        STATE.last_error = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
         return RedirectResponse(url="/", status_code=303)
 
     sheet = meta["sheet"]
-    df = read_sheet(STATE["path"], sheet)
+    df = read_sheet(STATE.path, sheet)
     cols = [c for c in df.columns.tolist() if c != "human_id"]
 
     # Prefill parent reference if provided and applicable
@@ -1154,7 +1497,7 @@ def create_form(request: Request, level: str, parent: str = "", user=Depends(req
     # Defaults
     prefill.setdefault("status", "draft")
 
-    lookups = lookup_options_by_level(STATE["path"], meta["level"])
+    lookups = lookup_options_by_level(STATE.path, meta["level"])
 
     return _render(
         request,
@@ -1167,7 +1510,7 @@ def create_form(request: Request, level: str, parent: str = "", user=Depends(req
             "parent_col": parent_col or "",
             "prefill": prefill,
             "lookups": lookups,
-            "last_error": STATE.get("last_error", ""),
+            "last_error": STATE.last_error,
         },
     )
 
@@ -1180,9 +1523,10 @@ async def create_preview(request: Request, level: str, user=Depends(require_role
 
     meta = meta_for_level(level)
     if not meta:
-        STATE["last_error"] = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
+        STATE.last_error = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
         return RedirectResponse(url="/", status_code=303)
 
+    fields: dict[str, str] = {}
     try:
         form = await request.form()
         fields = {str(k): ("" if v is None else str(v)).strip() for k, v in form.items()}
@@ -1198,9 +1542,9 @@ async def create_preview(request: Request, level: str, user=Depends(require_role
                 raise ValueError(f"El campo '{parent_col}' es obligatorio para {meta['level']}.")
 
         # Predict next id for display (not a reservation)
-        next_id = generate_next_human_id(STATE["path"], meta["sheet"], meta["prefix"])
+        next_id = generate_next_human_id(STATE.path, meta["sheet"], meta["prefix"])
 
-        STATE["last_error"] = ""
+        STATE.last_error = ""
         return _render(
             request,
             "create_confirm.html",
@@ -1213,15 +1557,12 @@ async def create_preview(request: Request, level: str, user=Depends(require_role
             },
         )
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         # redirect back to form (keep parent if present)
         parent = ""
         pc = meta.get("parent_col")
         if pc:
-            try:
-                parent = (await request.form()).get(pc, "") or ""
-            except Exception:
-                parent = ""
+            parent = fields.get(pc, "")
         url = f"/create/{meta['level']}"
         if parent:
             url += f"?parent={parent}"
@@ -1236,24 +1577,22 @@ async def create_confirm(request: Request, level: str, user=Depends(require_role
 
     meta = meta_for_level(level)
     if not meta:
-        STATE["last_error"] = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
+        STATE.last_error = f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4."
         return RedirectResponse(url="/", status_code=303)
 
+    fields: dict[str, str] = {}
     try:
         form = await request.form()
         fields = {str(k): ("" if v is None else str(v)).strip() for k, v in form.items()}
 
-        new_id, view_full, issues, views_by_level = create_record(path=STATE["path"], level=meta["level"], fields=fields)
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        STATE["last_error"] = ""
+        new_id, view_full, issues, views_by_level = create_record(path=STATE.path, level=meta["level"], fields=fields)
+        _set_views(view_full, issues, views_by_level)
+        STATE.last_error = ""
 
         return RedirectResponse(url=f"/record/{canon(new_id)}", status_code=303)
 
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         # back to form
         parent = ""
         pc = meta.get("parent_col")
@@ -1273,23 +1612,20 @@ def deprecate(human_id: str, user=Depends(require_role("editor"))):
 
     meta = detect_level_meta(human_id)
     if not meta:
-        STATE["last_error"] = f"human_id '{human_id}' no reconocido."
+        STATE.last_error = f"human_id '{human_id}' no reconocido."
         return RedirectResponse(url="/", status_code=303)
 
     try:
         view_full, issues, views_by_level = update_record_existing_fields(
-            path=STATE["path"], human_id=human_id, fields={"status": "deprecated"}
+            path=STATE.path, human_id=human_id, fields={"status": "deprecated"}
         )
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        STATE["last_error"] = ""
+        _set_views(view_full, issues, views_by_level)
+        STATE.last_error = ""
 
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
 
@@ -1312,33 +1648,30 @@ def update_existing_fields(
             raise ValueError("El campo (field) no puede estar vacío.")
 
         view_full, issues, views_by_level = update_record_existing_fields(
-            path=STATE["path"],
+            path=STATE.path,
             human_id=human_id,
             fields={field: value},
         )
-        STATE["view_full"] = view_full
-        STATE["issues"] = issues
-        STATE["views_by_level"] = views_by_level
-        STATE["last_regen"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        STATE["last_error"] = ""
+        _set_views(view_full, issues, views_by_level)
+        STATE.last_error = ""
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
     except Exception as e:
-        STATE["last_error"] = str(e)
+        STATE.last_error = str(e)
         return RedirectResponse(url=f"/record/{canon(human_id)}", status_code=303)
 
 
 @app.get("/export/view-full.csv")
 def export_view_full(user=Depends(require_user)):
-    df = STATE["view_full"]
+    df = STATE.view_full
     if df is None or df.empty:
         return RedirectResponse(url="/", status_code=303)
     # Exporta la vista canónica (prefijada) SIN aliases de UI
-    return df_to_csv_stream(df)
+    return df_to_csv_stream(df, filename="view_full.csv")
 
 
 @app.get("/export/issues.csv")
 def export_issues(user=Depends(require_user)):
-    df = STATE["issues"]
+    df = STATE.issues
     if df is None or df.empty:
         return RedirectResponse(url="/", status_code=303)
-    return df_to_csv_stream(df)
\ No newline at end of file
+    return df_to_csv_stream(df, filename="issues.csv")
\ No newline at end of file
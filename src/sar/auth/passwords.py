@@ -3,10 +3,18 @@
 
 from __future__ import annotations
 
-from argon2 import PasswordHasher
+import os
+
+from argon2 import DEFAULT_MEMORY_COST, DEFAULT_PARALLELISM, DEFAULT_TIME_COST, PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 
-_PH = PasswordHasher()
+# Coste del KDF ajustable por entorno. Solo afecta a los hashes nuevos: cada hash
+# guarda sus propios parámetros, así que verify_password sigue aceptando los antiguos.
+_PH = PasswordHasher(
+    time_cost=int(os.getenv("SAR_ARGON2_TIME_COST", str(DEFAULT_TIME_COST))),
+    memory_cost=int(os.getenv("SAR_ARGON2_MEMORY_COST", str(DEFAULT_MEMORY_COST))),
+    parallelism=int(os.getenv("SAR_ARGON2_PARALLELISM", str(DEFAULT_PARALLELISM))),
+)
 
 
 def hash_password(plain: str) -> str:
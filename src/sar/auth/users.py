@@ -5,13 +5,18 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional
 
 import yaml
 
 from sar.auth.passwords import verify_password
 
+# libyaml-backed (C) safe loader/dumper when PyYAML was built with it; same output, much faster.
+YAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_SAFE_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 # IMPORTANT: do not rely on current working directory.
 # Anchor the default users.yml path to the project root (works well with editable installs).
 BASE_DIR = Path(__file__).resolve().parents[3]  # .../sarproj
@@ -28,13 +33,10 @@ class UserRecord:
     password_hash: str
 
 
-_CACHE: Tuple[float, Dict[str, UserRecord]] = (0.0, {})
-
-
 def _load_users_file(path: Path) -> Dict[str, UserRecord]:
     if not path.exists():
         return {}
-    raw = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    raw = yaml.load(path.read_text(encoding="utf-8"), Loader=YAML_SAFE_LOADER) or {}
     users = (raw.get("users") or {}) if isinstance(raw, dict) else {}
     out: Dict[str, UserRecord] = {}
     for uname, udata in users.items():
@@ -55,20 +57,19 @@ def _load_users_file(path: Path) -> Dict[str, UserRecord]:
     return out
 
 
-def get_users(*, path: Path = DEFAULT_USERS_PATH) -> Dict[str, UserRecord]:
-    global _CACHE
-    try:
-        mtime = path.stat().st_mtime if path.exists() else 0.0
-    except Exception:
-        mtime = 0.0
+@lru_cache(maxsize=4)
+def _load_users_cached(path: str, mtime_ns: int, size: int) -> Dict[str, UserRecord]:
+    # mtime_ns/size only key the cache: editing users.yml yields a new entry.
+    return _load_users_file(Path(path))
 
-    cached_mtime, cached_users = _CACHE
-    if mtime and mtime == cached_mtime and cached_users:
-        return cached_users
 
-    users = _load_users_file(path)
-    _CACHE = (mtime, users)
-    return users
+def get_users(*, path: Path = DEFAULT_USERS_PATH) -> Dict[str, UserRecord]:
+    try:
+        st = path.stat()
+        mtime_ns, size = st.st_mtime_ns, st.st_size
+    except OSError:
+        mtime_ns, size = 0, 0
+    return _load_users_cached(str(path), mtime_ns, size)
 
 
 def get_user(username: str, *, path: Path = DEFAULT_USERS_PATH) -> Optional[UserRecord]:
@@ -32,10 +32,9 @@ CHILD_SHEETS = {
 def detect_level(human_id: str, *, canon_fn) -> Optional[Dict[str, Any]]:
     """Return level metadata for a human_id based on its prefix."""
     hid = canon_fn(human_id)
-    for prefix, meta in LEVELS.items():
-        if hid.startswith(prefix):
-            return meta
-    return None
+    # Every prefix is "<CODE>-", so the text up to the first dash is the lookup key.
+    head, sep, _ = hid.partition("-")
+    return LEVELS.get(head + sep) if sep else None
 
 
 # Reverse mapping (level code -> metadata including prefix)
@@ -3,29 +3,49 @@
 
 from __future__ import annotations
 
-import io
+import os
+from importlib.util import find_spec
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
 from fastapi.responses import StreamingResponse
 
+# Engine for pd.read_excel: the Rust-based calamine reader when python-calamine
+# is installed (optional, much faster), openpyxl otherwise. SAR_EXCEL_ENGINE
+# forces one (e.g. "openpyxl" to rule out reader differences).
+EXCEL_READ_ENGINE = (os.getenv("SAR_EXCEL_ENGINE") or "").strip().lower() or (
+    "calamine" if find_spec("python_calamine") else "openpyxl"
+)
+
 
 def canon(s: str) -> str:
     """Canonicalise IDs/keys for comparisons (trim + upper)."""
     return (s or "").strip().upper()
 
 
+def canon_series(s: pd.Series) -> pd.Series:
+    """Vectorised `canon` for a Series (trim + upper, element-wise)."""
+    return s.astype(str).str.strip().str.upper()
+
+
+def isin_ids(values: pd.Series, ids: Iterable[str]) -> np.ndarray:
+    """Boolean array: which `values` are in `ids` (exact match; canonicalise both first).
+
+    Probes a Python set: Series.isin on Arrow-backed strings boxes every entry of
+    `ids` into a pyarrow scalar, which dominates when `ids` is a whole level.
+    """
+    lookup = ids if isinstance(ids, (set, frozenset)) else set(ids)
+    return np.fromiter((v in lookup for v in values.tolist()), dtype=bool, count=len(values))
+
+
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Normalise dataframe column names to a stable snake_case-like lower format."""
-    df = df.copy()
-    df.columns = (
-        pd.Index(df.columns)
-        .map(lambda c: str(c).strip())
-        .map(lambda c: c.replace(" ", "_"))
-        .map(lambda c: c.replace("-", "_"))
-        .map(lambda c: c.lower())
+    # One pass over the names; set_axis returns a new frame without copying data.
+    return df.set_axis(
+        [str(c).strip().replace(" ", "_").replace("-", "_").lower() for c in df.columns],
+        axis=1,
     )
-    return df
 
 
 def safe_count(df: pd.DataFrame, col: str, value: str) -> int:
@@ -42,9 +62,42 @@ def first_existing_col(df: pd.DataFrame, *candidates: str) -> str:
     return ""
 
 
-def df_to_csv_stream(df: pd.DataFrame) -> StreamingResponse:
-    """Stream a dataframe as CSV without writing to disk."""
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    buf.seek(0)
-    return StreamingResponse(iter([buf.getvalue()]), media_type="text/csv")
+def search_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-cased string copy of df, reusable across `text_search_mask` calls."""
+    if df.shape[1] == 0:
+        return df.astype(str)
+    return pd.concat([df.iloc[:, i].astype(str).str.lower() for i in range(df.shape[1])], axis=1)
+
+
+def text_search_mask(df: pd.DataFrame, q: str, *, lowered: pd.DataFrame | None = None) -> pd.Series:
+    """Return a boolean mask of rows where any cell contains q (case-insensitive).
+
+    Vectorised per column (pandas str.contains) instead of a row-wise apply.
+    `lowered` is an optional `search_text(df)` kept by the caller, so repeated
+    searches over the same frame skip the per-cell lower-casing.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    if not q:
+        return pd.Series(mask, index=df.index)
+    text = search_text(df) if lowered is None else lowered
+    ql = q.lower()
+    for i in range(text.shape[1]):
+        mask |= text.iloc[:, i].str.contains(ql, regex=False, na=False).to_numpy(dtype=bool)
+    return pd.Series(mask, index=df.index)
+
+
+def df_to_csv_stream(df: pd.DataFrame, *, filename: str = "", chunk_rows: int = 10_000) -> StreamingResponse:
+    """Stream a dataframe as CSV without writing to disk.
+
+    Rows are serialised in chunks so memory stays bounded to one chunk and the
+    first bytes (header) are sent immediately.
+    """
+
+    def _gen() -> Iterable[str]:
+        yield df.iloc[:0].to_csv(index=False)
+        step = max(1, int(chunk_rows))
+        for start in range(0, len(df), step):
+            yield df.iloc[start : start + step].to_csv(index=False, header=False)
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else None
+    return StreamingResponse(_gen(), media_type="text/csv", headers=headers)
@@ -2,10 +2,15 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from operator import attrgetter
 from typing import Dict, List, Tuple, Any
+import numpy as np
 import pandas as pd
 
+from sar.core.utils import EXCEL_READ_ENGINE, isin_ids
+
 REQUIRED_SHEETS = [
     "META",
     "LOOKUPS",
@@ -16,11 +21,24 @@ REQUIRED_SHEETS = [
     "C4_Runtime",
 ]
 
+# Columns the engine reads from the config sheets (C1..C4 are read whole: the
+# views carry every column).
+LOOKUPS_COLUMNS = ("lookup_name", "lookup_value", "level")
+RULES_COLUMNS = (
+    "rule_id", "level", "group_id", "logic", "when_field", "op", "value", "severity", "message", "suggested_fix",
+)
+SHEET_USECOLS = {"LOOKUPS": LOOKUPS_COLUMNS, "RULES": RULES_COLUMNS}
+
+# Hierarchy keys: stripped once in compute(); validators and views rely on it.
+KEY_COLS = ("human_id", "c1_human_id", "c2_human_id", "c3_human_id")
+
+LEVEL_SHEETS = ("C1_Proyectos", "C2_Aplicaciones", "C3_Componentes", "C4_Runtime")
+
 VULN_FIELD = "vulnerabilities_detected"
 VULN_ALLOWED = {"yes", "no", "unknown"}
 
 # --- Issues model ---
-@dataclass
+@dataclass(slots=True)
 class Issue:
     issue_id: str
     severity: str          # error/warning/info
@@ -32,6 +50,12 @@ class Issue:
     suggested_fix: str
 
 
+ISSUE_COLUMNS = tuple(f.name for f in fields(Issue))
+
+
+_MULTIVALUE_SEP_RE = r"[,;|]"
+
+
 def _split_multivalue(value: Any) -> List[str]:
     """Split a cell that may contain 1 or multiple values.
 
@@ -92,21 +116,77 @@ def _derive_vuln_from_children(values: List[str]) -> str:
     return "no"
 
 
+def _key_values(df: pd.DataFrame, col: str) -> pd.Series:
+    """Stripped str values of `col`, or all-empty when the column is missing."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=str)
+    return df[col].astype(str).str.strip()
+
+
+def _parent_by_row(df: pd.DataFrame, fk: str) -> pd.Series:
+    """Parent id for each row, resolved through its human_id (last duplicate wins)."""
+    if "human_id" not in df.columns or fk not in df.columns:
+        return pd.Series("", index=df.index, dtype=str)
+    hids = _key_values(df, "human_id")
+    by_hid = pd.Series(_key_values(df, fk).to_numpy(), index=hids.to_numpy())
+    by_hid = by_hid[~by_hid.index.duplicated(keep="last")]
+    return hids.map(by_hid)
+
+
+# _derive_vuln_by_parent priority codes: the lowest code among the children wins.
+_VULN_BY_CODE = np.array(["yes", "unknown", "no"], dtype=object)
+
+
+def _derive_vuln_by_parent(parents: pd.Series, values: pd.Series) -> pd.Series:
+    """Vectorised _derive_vuln_from_children, indexed by (non-empty) parent id.
+
+    Parents without any non-blank child are absent; callers default them to 'unknown'.
+    """
+    keep = ((parents != "") & (values != "")).to_numpy()
+    vals = values.to_numpy()[keep]
+    codes = np.where(vals == "yes", 0, np.where(vals == "unknown", 1, 2)).astype(np.int8)
+    best = pd.Series(codes, index=parents.to_numpy()[keep]).groupby(level=0, sort=False).min()
+    return pd.Series(_VULN_BY_CODE[best.to_numpy()], index=best.index, dtype=object)
+
+
 def load_registry_xlsx(path: str) -> Dict[str, pd.DataFrame]:
-    xls = pd.ExcelFile(path, engine="openpyxl")
+    xls = pd.ExcelFile(path, engine=EXCEL_READ_ENGINE)
     missing = [s for s in REQUIRED_SHEETS if s not in xls.sheet_names]
     if missing:
         raise ValueError(f"Faltan pestañas requeridas: {missing}")
+    # Two batched parses: whole sheets, and the config sheets projected to the
+    # union of their columns (trimmed per sheet below).
+    whole = [name for name in REQUIRED_SHEETS if name not in SHEET_USECOLS]
+    config = [name for name in REQUIRED_SHEETS if name in SHEET_USECOLS]
+    config_cols = set().union(*(SHEET_USECOLS[name] for name in config))
+    raw = pd.read_excel(xls, sheet_name=whole, dtype=str)
+    raw.update(pd.read_excel(xls, sheet_name=config, dtype=str, usecols=lambda c: str(c).strip() in config_cols))
+
     data: Dict[str, pd.DataFrame] = {}
     for name in REQUIRED_SHEETS:
-        df = pd.read_excel(xls, sheet_name=name, dtype=str).fillna("")
+        df = raw[name]
+        # Only the level sheets are filled here: their cells flow into the views
+        # and the per-row validators. META is not consumed by compute() and the
+        # LOOKUPS/RULES parsers fill the columns they read themselves.
+        if name in LEVEL_SHEETS:
+            df = df.fillna("")
         # Normalize column headers to avoid false "missing field" issues caused by
         # trailing spaces / non-breaking spaces / accidental whitespace in Excel.
         df.columns = [str(c).strip() for c in df.columns]
+        if name in SHEET_USECOLS:
+            df = df[[c for c in df.columns if c in SHEET_USECOLS[name]]]
         data[name] = df
     return data
 
 
+def strip_key_columns(*frames: pd.DataFrame) -> None:
+    """Strip whitespace from the KEY_COLS present in each frame (in place)."""
+    for df in frames:
+        for col in KEY_COLS:
+            if col in df.columns:
+                df[col] = df[col].astype(str).str.strip()
+
+
 def parse_lookups(df_lookups: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
     """Parse LOOKUPS sheet.
 
@@ -116,7 +196,9 @@ def parse_lookups(df_lookups: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
       - level (optional; defaults to 'ALL')
 
     Returns:
-      {lookup_name: {"values": set[str], "levels": set[str]}}
+      {lookup_name: {"values": frozenset[str], "levels": set[str], "allowed_str": str}}
+
+    `allowed_str` is the sorted, comma-joined values, used in suggested fixes.
     """
     if df_lookups is None or df_lookups.empty:
         return {}
@@ -125,23 +207,28 @@ def parse_lookups(df_lookups: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
     if not req_cols.issubset(set(df_lookups.columns)):
         return {}
 
-    tmp = df_lookups.fillna("").copy()
-    tmp["lookup_name"] = tmp.get("lookup_name", "").astype(str).str.strip()
-    tmp["lookup_value"] = tmp.get("lookup_value", "").astype(str).str.strip()
-    tmp["level"] = tmp.get("level", "ALL").astype(str).str.upper().str.strip()
+    tmp = pd.DataFrame(
+        {
+            "lookup_name": df_lookups["lookup_name"].fillna("").astype(str).str.strip(),
+            "lookup_value": df_lookups["lookup_value"].fillna("").astype(str).str.strip(),
+            "level": (
+                df_lookups["level"].fillna("").astype(str).str.upper().str.strip()
+                if "level" in df_lookups.columns
+                else "ALL"
+            ),
+        }
+    )
     tmp.loc[tmp["level"] == "", "level"] = "ALL"
+    tmp = tmp[(tmp["lookup_name"] != "") & (tmp["lookup_value"] != "")]
+    if tmp.empty:
+        return {}
 
-    out: Dict[str, Dict[str, Any]] = {}
-    for _, r in tmp.iterrows():
-        name = str(r.get("lookup_name", "")).strip()
-        val = str(r.get("lookup_value", "")).strip()
-        lvl = str(r.get("level", "ALL")).strip().upper() or "ALL"
-        if not name or not val:
-            continue
-        out.setdefault(name, {"values": set(), "levels": set()})
-        out[name]["values"].add(val)
-        out[name]["levels"].add(lvl)
-    return out
+    # sort=False keeps lookups in first-appearance order (drives issue order downstream)
+    grouped = tmp.groupby("lookup_name", sort=False).agg({"lookup_value": set, "level": set})
+    return {
+        name: {"values": frozenset(values), "levels": levels, "allowed_str": ", ".join(sorted(values))}
+        for name, values, levels in zip(grouped.index, grouped["lookup_value"], grouped["level"])
+    }
 
 
 def _lookup_names_for_level(lookups: Dict[str, Dict[str, Any]], level: str) -> List[str]:
@@ -154,12 +241,47 @@ def _lookup_names_for_level(lookups: Dict[str, Dict[str, Any]], level: str) -> L
     return sorted(set(names))
 
 
+def _invalid_tokens(df: pd.DataFrame, field: str, allowed: set) -> List[Tuple[str, str]]:
+    """(human_id, token) for every token of `field` not in `allowed`, in row order.
+
+    Vectorised equivalent of running `_split_multivalue` on each cell.
+    """
+    vals = df[field].reset_index(drop=True)
+    vals = vals[vals.notna()].astype(str)
+    hids = df["human_id"].astype(str).to_numpy()
+
+    if not vals.str.contains(_MULTIVALUE_SEP_RE, regex=True).any():
+        # Single-valued column (the usual case): lookup fields are low-cardinality,
+        # so check each distinct value once and map the verdict back via codes.
+        codes, uniques = pd.factorize(vals)
+        stripped = np.array([u.strip() for u in uniques], dtype=object)
+        bad_u = np.array([bool(u) and u not in allowed for u in stripped], dtype=bool)
+        rows = np.flatnonzero(bad_u[codes])
+        if rows.size == 0:
+            return []
+        return list(zip(hids[vals.index.to_numpy()[rows]].tolist(), stripped[codes[rows]].tolist()))
+
+    tokens = (
+        vals.str.replace(";", ",", regex=False)
+        .str.replace("|", ",", regex=False)
+        .str.split(",", regex=False)
+        .explode()
+        .str.strip()
+    )
+    tokens = tokens[tokens.notna() & (tokens != "")]
+    bad = tokens[~tokens.isin(allowed)]
+    if bad.empty:
+        return []
+    return list(zip(hids[bad.index.to_numpy()].tolist(), bad.tolist()))
+
+
 def _validate_lookup_tokens(
     df: pd.DataFrame,
     level: str,
     field: str,
     allowed: set,
     issues: List[Issue],
+    allowed_str: str | None = None,
 ):
     """Validate a field against allowed values.
 
@@ -169,25 +291,25 @@ def _validate_lookup_tokens(
     """
     if df is None or df.empty or field not in df.columns or "human_id" not in df.columns:
         return
-    for _, r in df.iterrows():
-        hid = str(r.get("human_id", "")).strip()
-        raw = r.get(field, "")
-        values = _split_multivalue(raw)
-        # if it doesn't look like multi, _split_multivalue returns [token] for non-empty
-        for v in values:
-            if v and v not in allowed:
-                issues.append(
-                    Issue(
-                        issue_id=f"{level}-LOOKUP-{hid}-{field}-{v}",
-                        severity="error",
-                        level=level,
-                        human_id=hid,
-                        parent_ref="",
-                        issue_type="invalid_lookup",
-                        message=f"Valor inválido en {field}: '{v}' (lookup {field})",
-                        suggested_fix=f"Usar uno de: {', '.join(sorted(allowed))}",
-                    )
-                )
+    bad = _invalid_tokens(df, field, allowed)
+    if not bad:
+        return
+    fix = f"Usar uno de: {allowed_str if allowed_str is not None else ', '.join(sorted(allowed))}"
+    # Invalid tokens repeat across rows: format each distinct message once.
+    message_by_value = {v: f"Valor inválido en {field}: '{v}' (lookup {field})" for _, v in bad}
+    issues.extend(
+        Issue(
+            issue_id=f"{level}-LOOKUP-{hid}-{field}-{v}",
+            severity="error",
+            level=level,
+            human_id=hid,
+            parent_ref="",
+            issue_type="invalid_lookup",
+            message=message_by_value[v],
+            suggested_fix=fix,
+        )
+        for hid, v in bad
+    )
 
 
 def validate_lookups_for_level(
@@ -201,15 +323,17 @@ def validate_lookups_for_level(
     Convention (Opción A): lookup_name == field name.
     Only validates fields that actually exist in the sheet.
     """
+    if df is None or df.empty:
+        return
+    cols = set(df.columns)
     for name in _lookup_names_for_level(lookups, level):
-        if df is None or df.empty:
-            continue
-        if name not in df.columns:
+        if name not in cols:
             continue
-        allowed = set(lookups.get(name, {}).get("values", set()))
+        meta = lookups.get(name, {})
+        allowed = meta.get("values", frozenset())
         if not allowed:
             continue
-        _validate_lookup_tokens(df, level, name, allowed, issues)
+        _validate_lookup_tokens(df, level, name, allowed, issues, allowed_str=meta.get("allowed_str"))
 
 
 def validate_config_lookup_fields_exist(
@@ -224,17 +348,17 @@ def validate_config_lookup_fields_exist(
     """
     if not lookups:
         return
+    cols_by_level = {
+        lvl: set(df.columns) for lvl, df in views_by_level.items() if df is not None
+    }
     for name, meta in lookups.items():
         lvls = set(meta.get("levels", set()))
         for lvl in sorted(lvls):
             if lvl == "ALL":
                 continue
-            if lvl not in views_by_level:
-                continue
-            df = views_by_level[lvl]
-            if df is None:
+            if lvl not in cols_by_level:
                 continue
-            if name not in df.columns:
+            if name not in cols_by_level[lvl]:
                 issues.append(
                     Issue(
                         issue_id=f"{lvl}-LOOKUP-MISSINGFIELD-{name}",
@@ -260,8 +384,7 @@ def validate_config_rules_fields_exist(
     """
     if rules_df is None or rules_df.empty:
         return
-    required = {"rule_id", "level", "group_id", "logic", "when_field", "op", "value", "severity", "message", "suggested_fix"}
-    if not required.issubset(set(rules_df.columns)):
+    if not set(RULES_COLUMNS).issubset(set(rules_df.columns)):
         return
 
     tmp = rules_df.fillna("").copy()
@@ -269,18 +392,20 @@ def validate_config_rules_fields_exist(
     tmp["rule_id"] = tmp.get("rule_id", "").astype(str).str.strip()
     tmp["when_field"] = tmp.get("when_field", "").astype(str).str.strip()
 
+    cols_by_level = {
+        lvl: set(df.columns)
+        for lvl, df in views_by_level.items()
+        if df is not None and not df.empty
+    }
     for _, r in tmp.iterrows():
         lvl = str(r.get("level", "")).upper().strip()
         rid = str(r.get("rule_id", "")).strip()
         wf = str(r.get("when_field", "")).strip()
         if not lvl or not rid or not wf or wf == "_rel":
             continue
-        if lvl not in views_by_level:
-            continue
-        df = views_by_level[lvl]
-        if df is None or df.empty:
+        if lvl not in cols_by_level:
             continue
-        if wf not in df.columns:
+        if wf not in cols_by_level[lvl]:
             issues.append(
                 Issue(
                     issue_id=f"{lvl}-RULE-MISSINGFIELD-{rid}-{wf}",
@@ -310,31 +435,46 @@ def validate_required(df: pd.DataFrame, level: str, required_cols: List[str], is
             ))
             continue
 
-    if "human_id" in df.columns:
-        for idx, r in df.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            for col in required_cols:
-                if col in df.columns:
-                    v = str(r.get(col, "")).strip()
-                    if not v:
-                        issues.append(Issue(
-                            issue_id=f"{level}-REQ-{hid or 'ROW'+str(idx)}-{col}",
-                            severity="error",
-                            level=level,
-                            human_id=hid,
-                            parent_ref="",
-                            issue_type="missing_required",
-                            message=f"Campo requerido vacío: {col}",
-                            suggested_fix=f"Rellenar '{col}'"
-                        ))
+    present = [col for col in required_cols if col in df.columns]
+    if "human_id" in df.columns and present and not df.empty:
+        hids = df["human_id"].astype(str).to_numpy()
+        # rows x required-cols mask of empty cells; nonzero() walks it row-major,
+        # which keeps the original row-then-column issue order.
+        empty = np.column_stack([df[col].astype(str).str.strip().eq("").to_numpy() for col in present])
+        rows, cols = np.nonzero(empty)
+        if rows.size == 0:
+            return
+        # Gather the per-violation values as arrays, then emit in one batch.
+        bad_hids = hids[rows].tolist()
+        bad_cols = np.asarray(present, dtype=object)[cols].tolist()
+        bad_labels = df.index.to_numpy()[rows].tolist()
+        # Per-column texts are formatted once, not once per violation.
+        message_by_col = {col: f"Campo requerido vacío: {col}" for col in present}
+        fix_by_col = {col: f"Rellenar '{col}'" for col in present}
+        id_prefix = f"{level}-REQ-"
+        issues.extend(
+            Issue(
+                issue_id=f"{id_prefix}{hid or 'ROW'+str(label)}-{col}",
+                severity="error",
+                level=level,
+                human_id=hid,
+                parent_ref="",
+                issue_type="missing_required",
+                message=message_by_col[col],
+                suggested_fix=fix_by_col[col]
+            )
+            for hid, col, label in zip(bad_hids, bad_cols, bad_labels)
+        )
 
 
 def validate_unique_human_id(df: pd.DataFrame, level: str, issues: List[Issue]):
     if "human_id" not in df.columns:
         return
-    s = df["human_id"].astype(str).str.strip()
-    dupes = s[s.duplicated(keep=False) & (s != "")]
-    for hid in sorted(set(dupes.tolist())):
+    s = df["human_id"].astype(str)
+    mask = s.duplicated(keep=False) & (s != "")
+    if not mask.any():
+        return
+    for hid in sorted(s[mask].unique()):
         issues.append(Issue(
             issue_id=f"{level}-DUP-{hid}",
             severity="error",
@@ -351,101 +491,111 @@ def validate_lookup_single(df: pd.DataFrame, level: str, field: str, lookup_name
     if field not in df.columns or lookup_name not in lookups or "human_id" not in df.columns:
         return
     allowed = lookups[lookup_name]
-    for _, r in df.iterrows():
-        hid = str(r.get("human_id", "")).strip()
-        v = str(r.get(field, "")).strip()
-        if v and v not in allowed:
-            issues.append(Issue(
-                issue_id=f"{level}-LOOKUP-{hid}-{field}",
-                severity="error",
-                level=level,
-                human_id=hid,
-                parent_ref="",
-                issue_type="invalid_lookup",
-                message=f"Valor inválido en {field}: '{v}' (lookup {lookup_name})",
-                suggested_fix=f"Usar uno de: {', '.join(sorted(allowed))}"
-            ))
+    hids = df["human_id"].astype(str)
+    vals = df[field].astype(str).str.strip()
+    bad = (vals != "") & ~vals.isin(allowed)
+    fix = f"Usar uno de: {', '.join(sorted(allowed))}"
+    bad_vals = vals[bad].tolist()
+    message_by_value = {v: f"Valor inválido en {field}: '{v}' (lookup {lookup_name})" for v in bad_vals}
+    issues.extend(
+        Issue(
+            issue_id=f"{level}-LOOKUP-{hid}-{field}",
+            severity="error",
+            level=level,
+            human_id=hid,
+            parent_ref="",
+            issue_type="invalid_lookup",
+            message=message_by_value[v],
+            suggested_fix=fix
+        )
+        for hid, v in zip(hids[bad].tolist(), bad_vals)
+    )
 
 
 def validate_lookup_multi(df: pd.DataFrame, level: str, field: str, lookup_name: str, lookups: Dict[str, set], issues: List[Issue]):
     if field not in df.columns or lookup_name not in lookups or "human_id" not in df.columns:
         return
     allowed = lookups[lookup_name]
-    for _, r in df.iterrows():
-        hid = str(r.get("human_id", "")).strip()
-        values = _split_multivalue(r.get(field, ""))
-        for v in values:
-            if v not in allowed:
-                issues.append(Issue(
-                    issue_id=f"{level}-LOOKUP-{hid}-{field}-{v}",
-                    severity="error",
-                    level=level,
-                    human_id=hid,
-                    parent_ref="",
-                    issue_type="invalid_lookup",
-                    message=f"Valor inválido en {field}: '{v}' (lookup {lookup_name})",
-                    suggested_fix=f"Usar uno de: {', '.join(sorted(allowed))}"
-                ))
+    fix = f"Usar uno de: {', '.join(sorted(allowed))}"
+    bad = _invalid_tokens(df, field, allowed)
+    message_by_value = {v: f"Valor inválido en {field}: '{v}' (lookup {lookup_name})" for _, v in bad}
+    issues.extend(
+        Issue(
+            issue_id=f"{level}-LOOKUP-{hid}-{field}-{v}",
+            severity="error",
+            level=level,
+            human_id=hid,
+            parent_ref="",
+            issue_type="invalid_lookup",
+            message=message_by_value[v],
+            suggested_fix=fix
+        )
+        for hid, v in bad
+    )
+
+
+def _check_orphans(
+    child: pd.DataFrame,
+    parent_ids: set,
+    child_fk: str,
+    level: str,
+    message: str,
+    suggested_fix: str,
+    issues: List[Issue],
+):
+    """Flag rows of `child` whose `child_fk` is empty or not in `parent_ids`."""
+    if child_fk not in child.columns or "human_id" not in child.columns:
+        return
+    # Key columns are already str (see strip_key_columns).
+    fk = child[child_fk]
+    hid = child["human_id"]
+    bad = (fk == "").to_numpy() | ~isin_ids(fk, parent_ids)
+    issues.extend(
+        Issue(
+            issue_id=f"{level}-ORPHAN-{hid_val}",
+            severity="error",
+            level=level,
+            human_id=hid_val,
+            parent_ref=fk_val,
+            issue_type="orphan",
+            message=message,
+            suggested_fix=suggested_fix
+        )
+        for hid_val, fk_val in zip(hid[bad].tolist(), fk[bad].tolist())
+    )
+
+
+def _ids_index(df: pd.DataFrame) -> set:
+    if "human_id" not in df.columns:
+        return set()
+    return set(df["human_id"].tolist())
 
 
 def validate_relations(
     c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4: pd.DataFrame,
     issues: List[Issue]
 ):
-    c1_ids = set(c1.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
-    c2_ids = set(c2.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
-    c3_ids = set(c3.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
-
     # C2 -> C1
-    if "c1_human_id" in c2.columns and "human_id" in c2.columns:
-        for _, r in c2.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            parent = str(r.get("c1_human_id", "")).strip()
-            if not parent or parent not in c1_ids:
-                issues.append(Issue(
-                    issue_id=f"C2-ORPHAN-{hid}",
-                    severity="error",
-                    level="C2",
-                    human_id=hid,
-                    parent_ref=parent,
-                    issue_type="orphan",
-                    message="Aplicación sin proyecto (C1) asociado o C1 inexistente",
-                    suggested_fix="Rellenar c1_human_id con un PRJ existente"
-                ))
-
+    _check_orphans(
+        c2, _ids_index(c1), "c1_human_id", "C2",
+        "Aplicación sin proyecto (C1) asociado o C1 inexistente",
+        "Rellenar c1_human_id con un PRJ existente",
+        issues,
+    )
     # C3 -> C2
-    if "c2_human_id" in c3.columns and "human_id" in c3.columns:
-        for _, r in c3.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            parent = str(r.get("c2_human_id", "")).strip()
-            if not parent or parent not in c2_ids:
-                issues.append(Issue(
-                    issue_id=f"C3-ORPHAN-{hid}",
-                    severity="error",
-                    level="C3",
-                    human_id=hid,
-                    parent_ref=parent,
-                    issue_type="orphan",
-                    message="Componente sin aplicación (C2) asociada o C2 inexistente",
-                    suggested_fix="Rellenar c2_human_id con un APP existente"
-                ))
-
+    _check_orphans(
+        c3, _ids_index(c2), "c2_human_id", "C3",
+        "Componente sin aplicación (C2) asociada o C2 inexistente",
+        "Rellenar c2_human_id con un APP existente",
+        issues,
+    )
     # C4 -> C3
-    if "c3_human_id" in c4.columns and "human_id" in c4.columns:
-        for _, r in c4.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            parent = str(r.get("c3_human_id", "")).strip()
-            if not parent or parent not in c3_ids:
-                issues.append(Issue(
-                    issue_id=f"C4-ORPHAN-{hid}",
-                    severity="error",
-                    level="C4",
-                    human_id=hid,
-                    parent_ref=parent,
-                    issue_type="orphan",
-                    message="Runtime sin componente (C3) asociado o C3 inexistente",
-                    suggested_fix="Rellenar c3_human_id con un CMP existente"
-                ))
+    _check_orphans(
+        c4, _ids_index(c3), "c3_human_id", "C4",
+        "Runtime sin componente (C3) asociado o C3 inexistente",
+        "Rellenar c3_human_id con un CMP existente",
+        issues,
+    )
 
 
 def normalize_and_derive_vulnerabilities(
@@ -489,144 +639,106 @@ def normalize_and_derive_vulnerabilities(
 
     c1n, c2n, c3n, c4n = c1.copy(), c2.copy(), c3.copy(), c4.copy()
 
-    # normalize keys
-    for df in (c1n, c2n, c3n, c4n):
-        if "human_id" in df.columns:
-            df["human_id"] = df["human_id"].astype(str).str.strip()
-    if "c1_human_id" in c2n.columns:
-        c2n["c1_human_id"] = c2n["c1_human_id"].astype(str).str.strip()
-    if "c2_human_id" in c3n.columns:
-        c3n["c2_human_id"] = c3n["c2_human_id"].astype(str).str.strip()
-    if "c3_human_id" in c4n.columns:
-        c4n["c3_human_id"] = c4n["c3_human_id"].astype(str).str.strip()
-
     # C3/C4: normalize and flag invalids (only if column exists)
     for level, df in (("C3", c3n), ("C4", c4n)):
         if VULN_FIELD not in df.columns:
             continue
-        new_vals = []
-        for _, r in df.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            raw = r.get(VULN_FIELD, "")
-            cv = _canon_vuln(raw)
-            if cv == "__invalid__":
-                issues.append(
-                    Issue(
-                        issue_id=f"{level}-VULN-INVALID-{hid}",
-                        severity="warning",
-                        level=level,
-                        human_id=hid,
-                        parent_ref="",
-                        issue_type="invalid_value",
-                        message=f"Valor inválido en {VULN_FIELD}: '{str(raw).strip()}'",
-                        suggested_fix="Usar uno de: yes, no, unknown",
-                    )
+        # Low-cardinality field: canonicalize each distinct raw value once and
+        # map the result back through the factorize codes.
+        codes, uniques = pd.factorize(df[VULN_FIELD], use_na_sentinel=False)
+        canon = np.array([_canon_vuln(u) for u in uniques], dtype=object)[codes]
+        invalid_rows = np.flatnonzero(canon == "__invalid__")
+        if invalid_rows.size:
+            if "human_id" in df.columns:
+                hids = df["human_id"].astype(str).str.strip().to_numpy()[invalid_rows].tolist()
+            else:
+                hids = [""] * invalid_rows.size
+            raws = [str(uniques[c]).strip() for c in codes[invalid_rows]]
+            issues.extend(
+                Issue(
+                    issue_id=f"{level}-VULN-INVALID-{hid}",
+                    severity="warning",
+                    level=level,
+                    human_id=hid,
+                    parent_ref="",
+                    issue_type="invalid_value",
+                    message=f"Valor inválido en {VULN_FIELD}: '{raw}'",
+                    suggested_fix="Usar uno de: yes, no, unknown",
                 )
-                cv = "unknown"
-            new_vals.append(cv)
-        df[VULN_FIELD] = new_vals
-
-    # Build ancestry maps
-    c3_to_c2 = {}
-    if "human_id" in c3n.columns and "c2_human_id" in c3n.columns:
-        c3_to_c2 = dict(zip(c3n["human_id"].astype(str), c3n["c2_human_id"].astype(str)))
-    c4_to_c3 = {}
-    if "human_id" in c4n.columns and "c3_human_id" in c4n.columns:
-        c4_to_c3 = dict(zip(c4n["human_id"].astype(str), c4n["c3_human_id"].astype(str)))
-
-    # Collect vuln values per C3 (from C4)
-    vuln_by_c3: Dict[str, List[str]] = {}
-    if VULN_FIELD in c4n.columns and "human_id" in c4n.columns:
-        for _, r in c4n.iterrows():
-            cid = str(r.get("human_id", "")).strip()
-            p = str(c4_to_c3.get(cid, "")).strip()
-            if not p:
-                continue
-            vuln_by_c3.setdefault(p, []).append(str(r.get(VULN_FIELD, "")).strip())
+                for hid, raw in zip(hids, raws)
+            )
+            canon[invalid_rows] = "unknown"
+        df[VULN_FIELD] = canon.tolist()
 
-    # Collect vuln values per C2 (from C3)
-    vuln_by_c2: Dict[str, List[str]] = {}
+    # Parent of each row. Like the old human_id -> parent dicts, a duplicated
+    # human_id resolves to the parent of its last occurrence.
+    c3_parent = _parent_by_row(c3n, "c2_human_id")
+    c4_parent = _parent_by_row(c4n, "c3_human_id")
+
+    # Derived value per C3 (from C4) and per C2 (from C3). Values are already
+    # canonical here: C3/C4 were normalized above.
+    vuln_by_c3 = pd.Series(dtype=object)
+    if VULN_FIELD in c4n.columns and "human_id" in c4n.columns:
+        vuln_by_c3 = _derive_vuln_by_parent(c4_parent, c4n[VULN_FIELD])
+    vuln_by_c2 = pd.Series(dtype=object)
     if VULN_FIELD in c3n.columns and "human_id" in c3n.columns:
-        for _, r in c3n.iterrows():
-            cid = str(r.get("human_id", "")).strip()
-            p = str(c3_to_c2.get(cid, "")).strip()
-            if not p:
-                continue
-            vuln_by_c2.setdefault(p, []).append(str(r.get(VULN_FIELD, "")).strip())
+        vuln_by_c2 = _derive_vuln_by_parent(c3_parent, c3n[VULN_FIELD])
 
     # If C3 has the column, we can infer from C4 for blanks
-    if VULN_FIELD in c3n.columns and vuln_by_c3:
-        inferred = []
-        for _, r in c3n.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            cur = str(r.get(VULN_FIELD, "")).strip()
-            inferred.append(cur or _derive_vuln_from_children(vuln_by_c3.get(hid, [])))
-        c3n[VULN_FIELD] = inferred
+    if VULN_FIELD in c3n.columns and (c4_parent != "").any() and VULN_FIELD in c4n.columns:
+        cur = c3n[VULN_FIELD].astype(str).str.strip()
+        inferred = _key_values(c3n, "human_id").map(vuln_by_c3).fillna("unknown")
+        c3n[VULN_FIELD] = cur.where(cur != "", inferred).tolist()
 
     # Inherit to C2 only if C2 has the column
     if VULN_FIELD in c2n.columns:
-        inherited = []
-        for _, r in c2n.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            inherited.append(_derive_vuln_from_children(vuln_by_c2.get(hid, [])))
-        c2n[VULN_FIELD] = inherited
+        c2n[VULN_FIELD] = _key_values(c2n, "human_id").map(vuln_by_c2).fillna("unknown").tolist()
 
     # Inherit to C1 only if C1 has the column (requires C2 inheritance too)
     if VULN_FIELD in c1n.columns and VULN_FIELD in c2n.columns and "c1_human_id" in c2n.columns:
-        by_c1: Dict[str, List[str]] = {}
-        for _, r in c2n.iterrows():
-            pid = str(r.get("c1_human_id", "")).strip()
-            if not pid:
-                continue
-            by_c1.setdefault(pid, []).append(str(r.get(VULN_FIELD, "")).strip())
-        inherited_c1 = []
-        for _, r in c1n.iterrows():
-            hid = str(r.get("human_id", "")).strip()
-            inherited_c1.append(_derive_vuln_from_children(by_c1.get(hid, [])))
-        c1n[VULN_FIELD] = inherited_c1
+        by_c1 = _derive_vuln_by_parent(_key_values(c2n, "c1_human_id"), c2n[VULN_FIELD])
+        c1n[VULN_FIELD] = _key_values(c1n, "human_id").map(by_c1).fillna("unknown").tolist()
 
     return {"C1": c1n, "C2": c2n, "C3": c3n, "C4": c4n}
 
 
 def _build_relation_helpers(c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4: pd.DataFrame) -> Dict[str, Any]:
     """Precompute relation data used by RULES."""
-    c1_ids = set(c1.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
-    c2_ids = set(c2.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
-    c3_ids = set(c3.get("human_id", pd.Series([], dtype=str)).astype(str).str.strip())
+    c1_ids = set(c1.get("human_id", pd.Series([], dtype=str)).astype(str))
+    c2_ids = set(c2.get("human_id", pd.Series([], dtype=str)).astype(str))
+    c3_ids = set(c3.get("human_id", pd.Series([], dtype=str)).astype(str))
 
     c2_parent = {}
     if "human_id" in c2.columns and "c1_human_id" in c2.columns:
-        c2_parent = dict(zip(c2["human_id"].astype(str).str.strip(), c2["c1_human_id"].astype(str).str.strip()))
+        c2_parent = dict(zip(c2["human_id"].astype(str), c2["c1_human_id"].astype(str)))
     c3_parent = {}
     if "human_id" in c3.columns and "c2_human_id" in c3.columns:
-        c3_parent = dict(zip(c3["human_id"].astype(str).str.strip(), c3["c2_human_id"].astype(str).str.strip()))
+        c3_parent = dict(zip(c3["human_id"].astype(str), c3["c2_human_id"].astype(str)))
     c4_parent = {}
     if "human_id" in c4.columns and "c3_human_id" in c4.columns:
-        c4_parent = dict(zip(c4["human_id"].astype(str).str.strip(), c4["c3_human_id"].astype(str).str.strip()))
+        c4_parent = dict(zip(c4["human_id"].astype(str), c4["c3_human_id"].astype(str)))
 
     # descendant counts
     counts_c2_by_c1 = {}
     if "c1_human_id" in c2.columns:
-        counts_c2_by_c1 = c2.groupby(c2["c1_human_id"].astype(str).str.strip()).size().to_dict()
+        counts_c2_by_c1 = c2.groupby(c2["c1_human_id"].astype(str)).size().to_dict()
     counts_c3_by_c2 = {}
     if "c2_human_id" in c3.columns:
-        counts_c3_by_c2 = c3.groupby(c3["c2_human_id"].astype(str).str.strip()).size().to_dict()
+        counts_c3_by_c2 = c3.groupby(c3["c2_human_id"].astype(str)).size().to_dict()
     counts_c4_by_c3 = {}
     if "c3_human_id" in c4.columns:
-        counts_c4_by_c3 = c4.groupby(c4["c3_human_id"].astype(str).str.strip()).size().to_dict()
+        counts_c4_by_c3 = c4.groupby(c4["c3_human_id"].astype(str)).size().to_dict()
 
     # runtimes by C2 and C1
     runtimes_by_c2: Dict[str, int] = {}
     runtimes_by_c1: Dict[str, int] = {}
     if not c4.empty and "c3_human_id" in c4.columns and c3_parent and c2_parent:
-        for _, r in c4.iterrows():
-            c3_id = str(r.get("c3_human_id", "")).strip()
-            c2_id = str(c3_parent.get(c3_id, "")).strip()
-            c1_id = str(c2_parent.get(c2_id, "")).strip()
-            if c2_id:
-                runtimes_by_c2[c2_id] = runtimes_by_c2.get(c2_id, 0) + 1
-            if c1_id:
-                runtimes_by_c1[c1_id] = runtimes_by_c1.get(c1_id, 0) + 1
+        # Resolve each runtime's C2 and C1 through the parent maps, then count.
+        c3_of_rt = c4["c3_human_id"].astype(str).str.strip()
+        c2_of_rt = c3_of_rt.map(c3_parent).fillna("").astype(str).str.strip()
+        c1_of_rt = c2_of_rt.map(c2_parent).fillna("").astype(str).str.strip()
+        runtimes_by_c2 = c2_of_rt[c2_of_rt != ""].value_counts(sort=False).to_dict()
+        runtimes_by_c1 = c1_of_rt[c1_of_rt != ""].value_counts(sort=False).to_dict()
 
     return {
         "ids": {"C1": c1_ids, "C2": c2_ids, "C3": c3_ids},
@@ -660,109 +772,174 @@ def evaluate_rules(
 
     if rules_df is None or rules_df.empty:
         return
-    required = {"rule_id", "level", "group_id", "logic", "when_field", "op", "value", "severity", "message", "suggested_fix"}
-    if not required.issubset(set(rules_df.columns)):
+    if not set(RULES_COLUMNS).issubset(set(rules_df.columns)):
         return
 
-    rules_df = rules_df.fillna("")
-    for rule_id, rrule in rules_df.groupby("rule_id"):
-        rrule = rrule.copy()
-        level = str(rrule["level"].iloc[0]).strip()
+    plans = _compile_rules(
+        tuple(rules_df[list(RULES_COLUMNS)].fillna("").itertuples(index=False, name=None))
+    )
+    # Stripped field values per (level, field), shared by every rule on that level.
+    field_cache: Dict[Tuple[str, str], pd.Series] = {}
+    for plan in plans:
+        level = plan.level
         if level not in views_by_level:
             continue
         df = views_by_level[level]
         if df is None or df.empty or "human_id" not in df.columns:
             continue
 
-        groups = dict(tuple(rrule.groupby("group_id")))
-        # evaluate per record
-        for _, rec in df.iterrows():
-            hid = str(rec.get("human_id", "")).strip()
-            if not hid:
-                continue
-            triggered = False
-            for _, g in groups.items():
-                logic = str(g["logic"].iloc[0]).strip().upper() or "AND"
-                cond_results = []
-                for _, c in g.iterrows():
-                    when_field = str(c.get("when_field", "")).strip()
-                    op = str(c.get("op", "")).strip().lower()
-                    val = str(c.get("value", "")).strip()
-
-                    res = False
-                    if when_field == "_rel":
-                        # relational checks
-                        if op == "missing_parent":
-                            parent_level = val.strip()
-                            parent_map = rel.get("parent", {}).get(level, {})
-                            parent_id = str(parent_map.get(hid, "")).strip()
-                            parent_ids = rel.get("ids", {}).get(parent_level, set())
-                            res = (not parent_id) or (parent_id not in parent_ids)
-                        elif op == "no_descendant":
-                            desc_level = val.strip()
-                            # implemented for descendant C4 only (runtime) from C1/C2/C3
-                            if level == "C1" and desc_level == "C4":
-                                res = int(rel.get("counts", {}).get("C4_by_C1", {}).get(hid, 0)) == 0
-                            elif level == "C2" and desc_level == "C4":
-                                res = int(rel.get("counts", {}).get("C4_by_C2", {}).get(hid, 0)) == 0
-                            elif level == "C3" and desc_level == "C4":
-                                res = int(rel.get("counts", {}).get("C4_by_C3", {}).get(hid, 0)) == 0
-                            elif level == "C1" and desc_level == "C2":
-                                res = int(rel.get("counts", {}).get("C2_by_C1", {}).get(hid, 0)) == 0
-                            elif level == "C2" and desc_level == "C3":
-                                res = int(rel.get("counts", {}).get("C3_by_C2", {}).get(hid, 0)) == 0
-                    else:
-                        # field-based checks
-                        if when_field not in df.columns:
-                            # Missing field: ignore condition (and avoid false positives on empty)
-                            res = False
-                        else:
-                            field_val = str(rec.get(when_field, "")).strip()
-                            if op == "eq":
-                                res = field_val == val
-                            elif op == "ne":
-                                res = field_val != val
-                            elif op == "empty":
-                                res = field_val == ""
-                            elif op == "not_empty":
-                                res = field_val != ""
-                            elif op == "contains":
-                                res = val.lower() in field_val.lower()
-                            elif op == "in":
-                                allowed = {x.strip() for x in val.split(",") if x.strip()}
-                                res = field_val in allowed
-                            elif op == "not_in":
-                                denied = {x.strip() for x in val.split(",") if x.strip()}
-                                res = field_val not in denied
-
-                    cond_results.append(bool(res))
-
-                if not cond_results:
-                    continue
-                if logic == "OR":
-                    group_ok = any(cond_results)
-                else:
-                    group_ok = all(cond_results)
-                if group_ok:
-                    triggered = True
-                    break
-
-            if triggered:
-                sev = str(rrule.get("severity", "error").iloc[0]).strip() or "error"
-                msg = str(rrule.get("message", "").iloc[0])
-                fix = str(rrule.get("suggested_fix", "").iloc[0])
-                issues.append(
-                    Issue(
-                        issue_id=f"RULE-{rule_id}-{hid}",
-                        severity=sev,
-                        level=level,
-                        human_id=hid,
-                        parent_ref="",
-                        issue_type="rule",
-                        message=msg,
-                        suggested_fix=fix,
-                    )
-                )
+        hids = _rule_field_values(df, level, "human_id", field_cache)
+        # Any matching group triggers the rule; rows without human_id never do.
+        triggered = np.zeros(len(df), dtype=bool)
+        for logic, conditions in plan.groups:
+            cond_masks = [
+                _rule_condition_mask(df, level, hids, when_field, op, val, rel, field_cache)
+                for when_field, op, val in conditions
+            ]
+            if logic == "OR":
+                triggered |= np.logical_or.reduce(cond_masks)
+            else:
+                triggered |= np.logical_and.reduce(cond_masks)
+
+        rows = np.flatnonzero(triggered & (hids != "").to_numpy())
+        if rows.size == 0:
+            continue
+        issues.extend(
+            Issue(
+                issue_id=f"RULE-{plan.rule_id}-{hid}",
+                severity=plan.severity,
+                level=level,
+                human_id=hid,
+                parent_ref="",
+                issue_type="rule",
+                message=plan.message,
+                suggested_fix=plan.suggested_fix,
+            )
+            for hid in hids.to_numpy()[rows].tolist()
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _RulePlan:
+    """One RULES rule_id, parsed: groups of (logic, ((when_field, op, value), ...))."""
+    rule_id: str
+    level: str
+    severity: str
+    message: str
+    suggested_fix: str
+    groups: Tuple[Tuple[str, Tuple[Tuple[str, str, str], ...]], ...]
+
+
+@lru_cache(maxsize=8)
+def _compile_rules(rows: Tuple[Tuple[Any, ...], ...]) -> Tuple[_RulePlan, ...]:
+    """Parse RULES rows (RULES_COLUMNS order) into plans, ordered by rule_id.
+
+    Keyed on the sheet contents, so the RULES sheet is parsed once while it is
+    unchanged, even across workbook edits.
+    """
+    by_rule: Dict[Any, List[Tuple[Any, ...]]] = {}
+    for row in rows:
+        by_rule.setdefault(row[0], []).append(row)
+
+    plans = []
+    for rule_id in sorted(by_rule):
+        rrows = by_rule[rule_id]
+        _, level, _, _, _, _, _, severity, message, suggested_fix = rrows[0]
+        by_group: Dict[Any, List[Tuple[Any, ...]]] = {}
+        for row in rrows:
+            by_group.setdefault(row[2], []).append(row)
+        groups = tuple(
+            (
+                str(grows[0][3]).strip().upper() or "AND",
+                tuple(
+                    (str(when_field).strip(), str(op).strip().lower(), str(val).strip())
+                    for _, _, _, _, when_field, op, val, _, _, _ in grows
+                ),
+            )
+            for _, grows in sorted(by_group.items())
+        )
+        plans.append(
+            _RulePlan(
+                rule_id=rule_id,
+                level=str(level).strip(),
+                severity=str(severity).strip() or "error",
+                message=str(message),
+                suggested_fix=str(suggested_fix),
+                groups=groups,
+            )
+        )
+    return tuple(plans)
+
+
+def _rule_field_values(
+    df: pd.DataFrame, level: str, field: str, field_cache: Dict[Tuple[str, str], pd.Series]
+) -> pd.Series:
+    values = field_cache.get((level, field))
+    if values is None:
+        values = df[field].fillna("").astype(str).str.strip()
+        field_cache[(level, field)] = values
+    return values
+
+
+# no_descendant: (level, descendant level) -> key in rel["counts"]
+_DESCENDANT_COUNTS = {
+    ("C1", "C4"): "C4_by_C1",
+    ("C2", "C4"): "C4_by_C2",
+    ("C3", "C4"): "C4_by_C3",
+    ("C1", "C2"): "C2_by_C1",
+    ("C2", "C3"): "C3_by_C2",
+}
+
+
+def _rule_condition_mask(
+    df: pd.DataFrame,
+    level: str,
+    hids: pd.Series,
+    when_field: str,
+    op: str,
+    val: str,
+    rel: Dict[str, Any],
+    field_cache: Dict[Tuple[str, str], pd.Series],
+) -> np.ndarray:
+    """Boolean mask (one entry per row of `df`) for a single RULES condition."""
+    if when_field == "_rel":
+        # relational checks
+        if op == "missing_parent":
+            parent_map = rel.get("parent", {}).get(level, {})
+            parent_ids = rel.get("ids", {}).get(val, set())
+            parents = hids.map(parent_map).fillna("").astype(str).str.strip()
+            return (parents == "").to_numpy() | ~isin_ids(parents, parent_ids)
+        if op == "no_descendant":
+            # implemented for descendant C4 only (runtime) from C1/C2/C3, plus direct children
+            key = _DESCENDANT_COUNTS.get((level, val))
+            if key is not None:
+                counts = rel.get("counts", {}).get(key, {})
+                return hids.map(counts).fillna(0).astype(int).eq(0).to_numpy()
+        return np.zeros(len(df), dtype=bool)
+
+    # field-based checks
+    if when_field not in df.columns:
+        # Missing field: ignore condition (and avoid false positives on empty)
+        return np.zeros(len(df), dtype=bool)
+    values = _rule_field_values(df, level, when_field, field_cache)
+    if op == "eq":
+        return values.eq(val).to_numpy()
+    if op == "ne":
+        return values.ne(val).to_numpy()
+    if op == "empty":
+        return values.eq("").to_numpy()
+    if op == "not_empty":
+        return values.ne("").to_numpy()
+    if op == "contains":
+        return values.str.lower().str.contains(val.lower(), regex=False).to_numpy(dtype=bool)
+    if op in ("in", "not_in"):
+        listed = {x.strip() for x in val.split(",") if x.strip()}
+        hit = values.isin(listed).to_numpy()
+        return hit if op == "in" else ~hit
+    return np.zeros(len(df), dtype=bool)
+
+
+_VIEW_FULL_DROP = ("c2__c1_human_id", "c3__c2_human_id", "c4__c3_human_id")
 
 
 def generate_view_full(c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4: pd.DataFrame) -> pd.DataFrame:
@@ -775,27 +952,27 @@ def generate_view_full(c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4:
       - Mantiene cualquier columna existente (incl. placeholders de riesgo)
     """
 
-    c1n, c2n, c3n, c4n = c1.copy(), c2.copy(), c3.copy(), c4.copy()
+    # Claves ya normalizadas (strip) en compute(); add_prefix devuelve un frame nuevo
+    c1p = c1.add_prefix("c1__")
+    c2p = c2.add_prefix("c2__")
+    c3p = c3.add_prefix("c3__")
+    c4p = c4.add_prefix("c4__")
+
+    # Si algún nivel está vacío no hay cadenas completas: mismas columnas, sin merges
+    if min(len(c1p), len(c2p), len(c3p), len(c4p)) == 0:
+        return pd.DataFrame(
+            {
+                c: pd.Series(dtype=df[c].dtype)
+                for df in (c4p, c3p, c2p, c1p)
+                for c in df.columns
+                if c not in _VIEW_FULL_DROP
+            }
+        )
 
-    # Normaliza claves (strip)
-    for df in (c1n, c2n, c3n, c4n):
-        if "human_id" in df.columns:
-            df["human_id"] = df["human_id"].astype(str).str.strip()
-
-    if "c1_human_id" in c2n.columns:
-        c2n["c1_human_id"] = c2n["c1_human_id"].astype(str).str.strip()
-    if "c2_human_id" in c3n.columns:
-        c3n["c2_human_id"] = c3n["c2_human_id"].astype(str).str.strip()
-    if "c3_human_id" in c4n.columns:
-        c4n["c3_human_id"] = c4n["c3_human_id"].astype(str).str.strip()
-
-    # Prefijos dinámicos
-    c1p = c1n.add_prefix("c1__")
-    c2p = c2n.add_prefix("c2__")
-    c3p = c3n.add_prefix("c3__")
-    c4p = c4n.add_prefix("c4__")
-
-    # Merge chain desde runtime hacia arriba (solo cadenas completas)
+    # Merge chain desde runtime hacia arriba (solo cadenas completas).
+    # Nota: set_index + join (o get_indexer + take) no mejora aquí: con pandas 3
+    # el merge inner ya usa una sola tabla hash por paso y medido da lo mismo;
+    # además merge conserva el orden izquierdo y los duplicados de human_id.
     j = c4p.merge(
         c3p,
         left_on="c4__c3_human_id",
@@ -816,11 +993,12 @@ def generate_view_full(c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4:
     )
 
     # Compact: elimina solo los 3 campos redundantes de jerarquía
-    drop_cols = [c for c in ["c2__c1_human_id", "c3__c2_human_id", "c4__c3_human_id"] if c in j.columns]
+    drop_cols = [c for c in _VIEW_FULL_DROP if c in j.columns]
     if drop_cols:
         j = j.drop(columns=drop_cols)
 
-    # Orden estable
+    # Orden estable. Las claves ya son dtype str (no object); pasarlas a category
+    # para ordenar por códigos es más lento por el ida y vuelta de conversión.
     sort_cols = [c for c in ["c1__human_id", "c2__human_id", "c3__human_id", "c4__human_id"] if c in j.columns]
     if sort_cols:
         j = j.sort_values(sort_cols, kind="mergesort")
@@ -829,16 +1007,24 @@ def generate_view_full(c1: pd.DataFrame, c2: pd.DataFrame, c3: pd.DataFrame, c4:
 
 
 def issues_to_df(issues: List[Issue]) -> pd.DataFrame:
-    return pd.DataFrame([i.__dict__ for i in issues]).fillna("")
+    if not issues:
+        # Clean registry: keep the schema so consumers can rely on the columns.
+        return pd.DataFrame(columns=list(ISSUE_COLUMNS), dtype=str)
+    row = attrgetter(*ISSUE_COLUMNS)
+    return pd.DataFrame([row(i) for i in issues], columns=list(ISSUE_COLUMNS)).fillna("")
 
 
 def compute(path: str) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, pd.DataFrame]]:
     data = load_registry_xlsx(path)
     c1, c2, c3, c4 = data["C1_Proyectos"], data["C2_Aplicaciones"], data["C3_Componentes"], data["C4_Runtime"]
+    strip_key_columns(c1, c2, c3, c4)
     lookups = parse_lookups(data["LOOKUPS"])
 
     issues: List[Issue] = []
 
+    # Los validadores por nivel se ejecutan en serie a propósito: con un pool de
+    # hilos no se gana nada (el GIL serializa casi todo el trabajo) y el orden
+    # de ISSUES deja de ser trivialmente determinista.
     # Required columns (MVP minimums; puedes ajustar)
     validate_required(c1, "C1", ["human_id", "status", "name"], issues)
     validate_required(c2, "C2", ["c1_human_id", "human_id", "status", "name"], issues)
@@ -3,16 +3,20 @@
 
 from __future__ import annotations
 
+import glob
 import hashlib
 import json
+import os
+import re
 import shutil
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
 from openpyxl import load_workbook
 
-from sar.core.utils import canon, normalize_columns
+from sar.core.utils import EXCEL_READ_ENGINE, canon, canon_series, normalize_columns
 
 
 def _norm_key(s: str) -> str:
@@ -20,14 +24,16 @@ def _norm_key(s: str) -> str:
     return str(s or "").strip().replace(" ", "_").replace("-", "_").lower()
 
 
-def update_fields_existing(path: str, sheet: str, human_id: str, fields: dict[str, object]) -> None:
+def update_fields_existing(path: str, sheet: str, human_id: str, fields: dict[str, object]) -> dict[str, object]:
     """Update one or more existing columns for a row identified by human_id.
 
     - Only updates columns that already exist in the sheet header.
     - Uses openpyxl to preserve formatting.
+    - Returns the fields whose value actually changed (an empty cell and "" count
+      as equal). If none did, the workbook is not saved.
     """
     if not fields:
-        return
+        return {}
 
     wb = load_workbook(path)
     if sheet not in wb.sheetnames:
@@ -69,18 +75,53 @@ def update_fields_existing(path: str, sheet: str, human_id: str, fields: dict[st
         raise ValueError(f"No se encontró '{human_id}' en '{sheet}'.")
 
     # Write updates
+    changed: dict[str, object] = {}
     for key, value in fields.items():
-        col_idx = headers[_norm_key(key)]
-        ws.cell(row=found_row, column=col_idx).value = value
+        cell = ws.cell(row=found_row, column=headers[_norm_key(key)])
+        if _cell_text(cell.value) == _cell_text(value):
+            continue
+        cell.value = value
+        changed[key] = value
 
-    wb.save(path)
+    if changed:
+        wb.save(path)
+    return changed
 
 
-def add_new_field_column(path: str, sheet: str, human_id: str, field_name: str, value: object) -> None:
+def _cell_text(value: object) -> str:
+    return "" if value is None else str(value)
+
+
+def fields_unchanged(path: str, sheet: str, human_id: str, fields: dict[str, object]) -> bool:
+    """True if the row already holds every value in `fields`.
+
+    Answered from the memoised `read_sheet` parse, so callers can skip a no-op
+    update without loading the workbook. False whenever it cannot tell (unknown
+    column, missing row): `update_fields_existing` then reports the error.
+    """
+    keys = {k: _norm_key(k) for k in fields}
+    df = read_sheet(path, sheet, usecols=list(keys.values()), filters={"human_id": human_id})
+    if df.empty or any(k not in df.columns for k in keys.values()):
+        return False
+    row = df.iloc[0]
+    return all(row[keys[k]] == _cell_text(v) for k, v in fields.items())
+
+
+def add_new_field_column(
+    path: str,
+    sheet: str,
+    human_id: str,
+    field_name: str,
+    value: object,
+    *,
+    schema_sheets: list[str] | None = None,
+) -> None:
     """Add a brand-new column to a sheet and set its value for the given human_id.
 
     - The column must NOT already exist (checked by canon/normalisation).
     - Uses openpyxl to preserve formatting.
+    - With `schema_sheets`, META is also marked schema_dirty (with the new
+      schema_hash over those sheets) in the same save; this part is best-effort.
     """
     field_name = str(field_name or "").strip()
     if not field_name:
@@ -125,6 +166,14 @@ def add_new_field_column(path: str, sheet: str, human_id: str, field_name: str,
     ws.cell(row=1, column=new_col).value = field_name
     ws.cell(row=found_row, column=new_col).value = value
 
+    if schema_sheets:
+        # Non-fatal: the column is saved even if META cannot be updated.
+        try:
+            h = schema_hash(_schema_map_from_wb(wb, schema_sheets))
+            _upsert_meta_kv(wb, {"schema_dirty": "yes", "schema_hash": h})
+        except Exception:
+            pass
+
     wb.save(path)
 
 
@@ -134,36 +183,19 @@ def generate_next_human_id(path: str, sheet: str, prefix: str) -> str:
     """Generate the next sequential human_id for a given sheet/prefix.
 
     This scans existing human_id values and returns PREFIX-### using 3-digit padding.
+    The column comes from the memoised `read_sheet` parse, so it costs one fast
+    column read per workbook change instead of an openpyxl walk of the sheet.
     """
-    wb = load_workbook(path, read_only=True)
-    if sheet not in wb.sheetnames:
-        raise ValueError(f"No existe la pestaña '{sheet}' en el Excel.")
-    ws = wb[sheet]
-
-    # Header mapping
-    headers: dict[str, int] = {}
-    for col in range(1, ws.max_column + 1):
-        v = ws.cell(row=1, column=col).value
-        if v is None:
-            continue
-        headers[_norm_key(v)] = col
-    if "human_id" not in headers:
+    try:
+        df = read_sheet(path, sheet, usecols=["human_id"])
+    except ValueError as exc:
+        raise ValueError(f"No existe la pestaña '{sheet}' en el Excel.") from exc
+    if "human_id" not in df.columns:
         raise ValueError(f"La pestaña '{sheet}' no tiene columna 'human_id'.")
 
-    col_hid = headers["human_id"]
-    max_n = 0
     pref = canon(prefix)
-    for row in range(2, ws.max_row + 1):
-        v = ws.cell(row=row, column=col_hid).value
-        s = canon(str(v or ""))
-        if not s.startswith(pref):
-            continue
-        m = __import__("re").match(r"^" + __import__("re").escape(pref) + r"(\d+)$", s)
-        if m:
-            try:
-                max_n = max(max_n, int(m.group(1)))
-            except Exception:
-                pass
+    nums = canon_series(df["human_id"]).str.extract("^" + re.escape(pref) + r"(\d+)$", expand=False).dropna()
+    max_n = max(map(int, nums), default=0)
 
     return f"{prefix}{max_n + 1:03d}"
 
@@ -218,19 +250,124 @@ def append_row_existing_columns(path: str, sheet: str, row: dict[str, object]) -
     wb.save(path)
 
 
-def read_sheet(path: str, sheet: str) -> pd.DataFrame:
-    """Read a sheet from the registry Excel into a normalised dataframe."""
-    df = pd.read_excel(path, sheet_name=sheet, dtype=str).fillna("")
-    return normalize_columns(df)
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+@lru_cache(maxsize=32)
+def _read_sheet_cached(
+    path: str,
+    mtime_ns: int,
+    sheet: str,
+    usecols: tuple[str, ...] | None,
+    filters: tuple[tuple[str, str], ...],
+) -> pd.DataFrame:
+    kwargs: dict[str, object] = {}
+    if usecols is not None:
+        wanted = {_norm_key(c) for c in usecols} | {_norm_key(c) for c, _ in filters}
+        kwargs["usecols"] = lambda c: _norm_key(c) in wanted
+    df = pd.read_excel(path, sheet_name=sheet, dtype=str, engine=EXCEL_READ_ENGINE, **kwargs).fillna("")
+    df = normalize_columns(df)
+    for col, value in filters:
+        k = _norm_key(col)
+        if k not in df.columns:
+            return df.iloc[0:0]
+        df = df[canon_series(df[k]) == canon(value)]
+    return df
+
+
+def read_sheet(
+    path: str,
+    sheet: str,
+    *,
+    usecols: list[str] | None = None,
+    filters: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """Read a sheet from the registry Excel into a normalised dataframe.
+
+    - usecols: only parse these columns (normalised names); unknown names are ignored.
+    - filters: keep only rows where canon(column) == canon(value) for every pair.
+      Filter columns are parsed even if not listed in usecols.
+
+    Parsed sheets are memoised on (path, mtime, sheet, usecols, filters); callers
+    get their own copy.
+    """
+    df = _read_sheet_cached(
+        path,
+        _mtime_ns(path),
+        sheet,
+        tuple(usecols) if usecols is not None else None,
+        tuple((str(k), str(v)) for k, v in (filters or {}).items()),
+    )
+    return df.copy()
+
+
+@lru_cache(maxsize=16)
+def _read_sheets_cached(
+    path: str,
+    mtime_ns: int,
+    specs: tuple[tuple[str, tuple[str, ...] | None], ...],
+) -> dict[str, pd.DataFrame]:
+    wanted_by_sheet = {
+        sheet: ({_norm_key(c) for c in cols} if cols is not None else None) for sheet, cols in specs
+    }
+    kwargs: dict[str, object] = {}
+    if all(w is not None for w in wanted_by_sheet.values()):
+        union = set().union(*wanted_by_sheet.values())
+        kwargs["usecols"] = lambda c: _norm_key(c) in union
+    raw = pd.read_excel(path, sheet_name=list(wanted_by_sheet), dtype=str, engine=EXCEL_READ_ENGINE, **kwargs)
+    out: dict[str, pd.DataFrame] = {}
+    for sheet, wanted in wanted_by_sheet.items():
+        df = normalize_columns(raw[sheet].fillna(""))
+        if wanted is not None:
+            df = df[[c for c in df.columns if c in wanted]]
+        out[sheet] = df
+    return out
+
+
+def read_sheets(path: str, usecols_map: dict[str, list[str] | None]) -> dict[str, pd.DataFrame]:
+    """Read several sheets opening the workbook once.
+
+    usecols_map: sheet -> columns to keep (None = all), as in `read_sheet`.
+    Returns sheet -> normalised dataframe (each caller gets its own copy).
+    """
+    if len(usecols_map) == 1:
+        ((sheet, usecols),) = usecols_map.items()
+        return {sheet: read_sheet(path, sheet, usecols=usecols)}
+    specs = tuple((s, tuple(c) if c is not None else None) for s, c in usecols_map.items())
+    dfs = _read_sheets_cached(path, _mtime_ns(path), specs)
+    return {s: df.copy() for s, df in dfs.items()}
+
+
+def build_hid_index(df: pd.DataFrame) -> dict[str, int]:
+    """Return {canon(human_id): row position} (first occurrence wins)."""
+    if df is None or df.empty or "human_id" not in df.columns:
+        return {}
+    out: dict[str, int] = {}
+    for pos, hid in enumerate(canon_series(df["human_id"]).tolist()):
+        out.setdefault(hid, pos)
+    return out
+
+
+@lru_cache(maxsize=32)
+def _hid_index_cached(path: str, mtime_ns: int, sheet: str) -> dict[str, int]:
+    return build_hid_index(_read_sheet_cached(path, mtime_ns, sheet, None, ()))
+
+
+def sheet_hid_index(path: str, sheet: str) -> dict[str, int]:
+    """human_id index for read_sheet(path, sheet) (memoised on file mtime)."""
+    return _hid_index_cached(path, _mtime_ns(path), sheet)
 
 
 def read_meta_dict(path: str) -> dict[str, str]:
     """Read META sheet as a key/value dictionary (both as strings)."""
     try:
-        df = pd.read_excel(path, sheet_name="META", dtype=str).fillna("")
+        df = read_sheet(path, "META")
     except Exception:
         return {}
-    df = normalize_columns(df)
     if "key" not in df.columns or "value" not in df.columns:
         return {}
     out: dict[str, str] = {}
@@ -247,6 +384,35 @@ def write_meta_kv(path: str, updates: dict[str, str]) -> None:
     if not updates:
         return
     wb = load_workbook(path)
+    _upsert_meta_kv(wb, updates)
+    wb.save(path)
+
+
+def create_registry_from_template(template_path: str, out_path: str, *, schema_sheets: list[str]) -> None:
+    """Write a fresh registry at out_path from the template, with META stamped.
+
+    The template is loaded once and saved once under the new name (no copy +
+    reopen): schema_version/schema_base_version come from the template META,
+    schema_hash from its headers over `schema_sheets`, and schema_dirty is "no".
+    """
+    tmeta = read_meta_dict(template_path)
+    base_ver = tmeta.get("schema_version") or tmeta.get("template_version", "")
+    wb = load_workbook(template_path)
+    _upsert_meta_kv(
+        wb,
+        {
+            "schema_version": base_ver,
+            "schema_hash": schema_hash(_schema_map_from_wb(wb, schema_sheets)),
+            "schema_base_version": base_ver,
+            "schema_dirty": "no",
+            "last_modified": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    )
+    wb.save(out_path)
+
+
+def _upsert_meta_kv(wb, updates: dict[str, str]) -> None:
+    """Apply META key/value upserts to an open (writable) workbook."""
     if "META" not in wb.sheetnames:
         raise ValueError("No existe la pestaña 'META' en el Excel.")
     ws = wb["META"]
@@ -284,15 +450,16 @@ def write_meta_kv(path: str, updates: dict[str, str]) -> None:
             ws.cell(row=rr, column=c_key).value = ks
         ws.cell(row=rr, column=c_val).value = str(v or "")
 
-    wb.save(path)
-
 
 def get_sheet_headers(path: str, sheet: str) -> list[str]:
     """Return normalised headers for a given sheet (row 1), excluding empty headers."""
     wb = load_workbook(path, read_only=True)
     if sheet not in wb.sheetnames:
         return []
-    ws = wb[sheet]
+    return _sheet_headers(wb[sheet])
+
+
+def _sheet_headers(ws) -> list[str]:
     out: list[str] = []
     for c in range(1, ws.max_column + 1):
         v = ws.cell(row=1, column=c).value
@@ -315,10 +482,17 @@ def get_sheet_headers(path: str, sheet: str) -> list[str]:
 
 def get_schema_map(path: str, sheets: list[str]) -> dict[str, list[str]]:
     """Return schema map: {sheet_name: [normalised_header, ...]}"""
-    sm: dict[str, list[str]] = {}
-    for sh in sheets:
-        sm[sh] = get_sheet_headers(path, sh)
-    return sm
+    # One workbook open for all sheets (each open re-reads the shared strings).
+    wb = load_workbook(path, read_only=True)
+    try:
+        return _schema_map_from_wb(wb, sheets)
+    finally:
+        wb.close()
+
+
+def _schema_map_from_wb(wb, sheets: list[str]) -> dict[str, list[str]]:
+    """get_schema_map over an already open workbook."""
+    return {sh: (_sheet_headers(wb[sh]) if sh in wb.sheetnames else []) for sh in sheets}
 
 
 def schema_hash(schema_map: dict[str, list[str]]) -> str:
@@ -362,8 +536,7 @@ def read_lookups(path: str) -> pd.DataFrame:
       - level (e.g. ALL / C1 / C2 / C3 / C4)
       - description (optional)
     """
-    df = pd.read_excel(path, sheet_name="LOOKUPS", dtype=str).fillna("")
-    return normalize_columns(df)
+    return read_sheet(path, "LOOKUPS")
 
 
 def lookup_options_by_level(path: str, level: str) -> dict[str, list[dict[str, str]]]:
@@ -409,9 +582,21 @@ def lookup_options_by_level(path: str, level: str) -> dict[str, list[dict[str, s
 
 
 def backup_registry(path: str) -> str:
-    """Create a timestamped .bak copy next to the registry file."""
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    """Create a timestamped .bak copy next to the registry file.
+
+    If the newest existing backup already matches the registry (copy2 keeps the
+    mtime, so equal mtime and size mean nothing was written since), that backup
+    is returned instead of copying the file again.
+    """
     src = Path(path)
+    st = src.stat()
+    latest = max(src.parent.glob(glob.escape(src.name) + ".bak_*"), default=None)
+    if latest is not None:
+        bak = latest.stat()
+        if bak.st_mtime_ns == st.st_mtime_ns and bak.st_size == st.st_size:
+            return str(latest)
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     dst = src.with_suffix(src.suffix + f".bak_{ts}")
     shutil.copy2(src, dst)
     return str(dst)
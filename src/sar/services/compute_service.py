@@ -3,6 +3,9 @@
 
 from __future__ import annotations
 
+import os
+import threading
+from functools import lru_cache
 from typing import Tuple, Dict
 
 import pandas as pd
@@ -12,6 +15,17 @@ import pandas as pd
 # Using an absolute package import makes execution robust regardless of CWD.
 from sar.engine import compute
 
+# Serialises cache fills so concurrent requests for the same workbook compute it once.
+_COMPUTE_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _compute_cached(
+    path: str, mtime_ns: int, size: int
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, pd.DataFrame]]:
+    # mtime_ns/size only key the cache: any write to the workbook yields a new entry.
+    return compute(path)
+
 
 def regenerate_views(path: str) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, pd.DataFrame]]:
     """Run the engine compute to produce:
@@ -19,5 +33,10 @@ def regenerate_views(path: str) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, p
     - view_full (runtime-centric chain)
     - issues (rules + validations)
     - views_by_level (C1..C4 derived, never raw Excel)
+
+    Results are cached per (path, mtime, size), so regenerating an unchanged
+    workbook is a lookup. Callers must treat the returned frames as read-only.
     """
-    return compute(path)
+    st = os.stat(path)
+    with _COMPUTE_LOCK:
+        return _compute_cached(path, st.st_mtime_ns, st.st_size)
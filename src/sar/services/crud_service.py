@@ -3,18 +3,19 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 from sar.infra.registry_repo import (
     backup_registry,
+    fields_unchanged,
     update_fields_existing,
     add_new_field_column,
     append_row_existing_columns,
     generate_next_human_id,
     read_sheet,
-    write_meta_kv,
-    get_schema_map,
-    schema_hash,
 )
 from sar.services.compute_service import regenerate_views
 from sar.services.record_service import detect_level_meta
@@ -35,15 +36,70 @@ SCHEMA_SHEETS = [
     "C4_Runtime",
 ]
 
+# Levels whose vulnerabilities_detected is inherited (read-only for CRUD).
+INHERITED_VULN_LEVELS = frozenset({"C1", "C2"})
+
+
+def _clean(value: Any) -> str:
+    """Same as str(value or "").strip(), without the detour for plain strings."""
+    if isinstance(value, str):
+        return value.strip()
+    return str(value or "").strip()
+
+
+# Per-thread batch state: nesting depth and the registries written inside it.
+_BATCH = threading.local()
+
+
+@dataclass(slots=True)
+class BatchResult:
+    """Views regenerated when the outermost `batch()` exits (None if nothing was written)."""
+    views: Optional[Tuple[Any, Any, Any]] = None
+
+
+@contextmanager
+def batch(path: str) -> Iterator[BatchResult]:
+    """Defer view regeneration across several CRUD calls.
+
+    Inside the block the CRUD helpers write as usual but return ``None`` in
+    place of the views; the registries written are regenerated once when the
+    outermost block exits cleanly, and the views for `path` are exposed as
+    ``result.views``.
+    """
+    result = BatchResult()
+    depth = getattr(_BATCH, "depth", 0)
+    if depth == 0:
+        _BATCH.dirty = []
+    _BATCH.depth = depth + 1
+    try:
+        yield result
+    finally:
+        _BATCH.depth = depth
+    if depth:
+        return
+    for written in _BATCH.dirty:
+        views = regenerate_views(written)
+        if written == path:
+            result.views = views
+
+
+def _views_after_write(path: str):
+    """Regenerate views after a write, or defer it when inside `batch()`."""
+    if getattr(_BATCH, "depth", 0):
+        if path not in _BATCH.dirty:
+            _BATCH.dirty.append(path)
+        return None, None, None
+    return regenerate_views(path)
+
 
 def _validate_parent_ref_exists(*, path: str, child_level: str, parent_ref: str) -> None:
     """Ensure parent_ref exists and is of the correct level for the child."""
-    cl = str(child_level or "").strip().upper()
+    cl = _clean(child_level).upper()
     pl = PARENT_LEVEL.get(cl)
     if not pl:
         return
 
-    pref = str(parent_ref or "").strip()
+    pref = _clean(parent_ref)
     if not pref:
         raise ValueError("El parent_id no puede estar vacío.")
 
@@ -56,7 +112,7 @@ def _validate_parent_ref_exists(*, path: str, child_level: str, parent_ref: str)
     pmeta = meta_for_level(pl)
     if not pmeta:
         raise ValueError(f"No se pudo resolver el nivel parent '{pl}'.")
-    pdf = read_sheet(path, pmeta["sheet"])
+    pdf = read_sheet(path, pmeta["sheet"], usecols=["human_id"], filters={"human_id": pref})
     if get_row_by_human_id(pdf, pref) is None:
         raise ValueError(f"Parent '{canon(pref)}' no existe en '{pmeta['sheet']}'.")
 
@@ -72,7 +128,7 @@ def update_record_existing_fields(*, path: str, human_id: str, fields: Dict[str,
         raise ValueError(f"human_id '{human_id}' no reconocido (prefijo no soportado).")
 
     # vulnerabilities_detected is derived in C1/C2 and must not be manually editable
-    if meta.get("level") in ("C1", "C2") and "vulnerabilities_detected" in fields:
+    if meta.get("level") in INHERITED_VULN_LEVELS and "vulnerabilities_detected" in fields:
         raise ValueError("'vulnerabilities_detected' no es editable en C1/C2 (se hereda de C3/C4).")
 
     # If the parent field is being updated, validate it exists (prevents typos).
@@ -80,12 +136,15 @@ def update_record_existing_fields(*, path: str, human_id: str, fields: Dict[str,
     if parent_col and parent_col in fields:
         _validate_parent_ref_exists(path=path, child_level=meta.get("level", ""), parent_ref=str(fields.get(parent_col, "")))
 
-    # Safety first
-    backup_registry(path)
-    update_fields_existing(path, meta["sheet"], human_id, fields)
+    # A no-op update writes nothing, so no backup is needed and the regenerate
+    # below is a hit on the compute cache (keyed on the file's mtime/size).
+    if not fields_unchanged(path, meta["sheet"], human_id, fields):
+        # Safety first
+        backup_registry(path)
+        update_fields_existing(path, meta["sheet"], human_id, fields)
 
     # Recompute derived views after each write
-    return regenerate_views(path)
+    return _views_after_write(path)
 
 
 def add_new_field(*, path: str, human_id: str, field_name: str, value: Any):
@@ -100,24 +159,11 @@ def add_new_field(*, path: str, human_id: str, field_name: str, value: Any):
         raise ValueError(f"human_id '{human_id}' no reconocido (prefijo no soportado).")
 
     backup_registry(path)
-    add_new_field_column(path, meta["sheet"], human_id, field_name, value)
-
-    # Mark schema dirty on the working registry (template promotion is a separate step)
-    try:
-        sm = get_schema_map(path, SCHEMA_SHEETS)
-        h = schema_hash(sm)
-        write_meta_kv(
-            path,
-            {
-                "schema_dirty": "yes",
-                "schema_hash": h,
-            },
-        )
-    except Exception:
-        # Non-fatal: registry can still work even if META cannot be updated
-        pass
+    # Also marks the schema dirty on the working registry (template promotion is a
+    # separate step), in the same workbook save.
+    add_new_field_column(path, meta["sheet"], human_id, field_name, value, schema_sheets=SCHEMA_SHEETS)
 
-    return regenerate_views(path)
+    return _views_after_write(path)
 
 def create_record(*, path: str, level: str, fields: Dict[str, Any]) -> tuple[str, Any, Any, Any]:
     """Create a new record for a given level (C1-C4) in the Excel registry.
@@ -133,7 +179,7 @@ def create_record(*, path: str, level: str, fields: Dict[str, Any]) -> tuple[str
         raise ValueError(f"Nivel '{level}' no reconocido. Usa C1, C2, C3 o C4.")
 
     # vulnerabilities_detected is only writable in C3/C4
-    if meta.get("level") in ("C1", "C2") and "vulnerabilities_detected" in fields:
+    if meta.get("level") in INHERITED_VULN_LEVELS and "vulnerabilities_detected" in fields:
         raise ValueError("'vulnerabilities_detected' no es editable en C1/C2 (se hereda de C3/C4).")
 
     sheet = meta["sheet"]
@@ -141,12 +187,12 @@ def create_record(*, path: str, level: str, fields: Dict[str, Any]) -> tuple[str
     parent_col = meta.get("parent_col")
 
     # Minimal required fields
-    name = str(fields.get("name", "") or "").strip()
+    name = _clean(fields.get("name"))
     if not name:
         raise ValueError("El campo 'name' es obligatorio.")
 
     if parent_col:
-        parent_ref = str(fields.get(parent_col, "") or "").strip()
+        parent_ref = _clean(fields.get(parent_col))
         if not parent_ref:
             raise ValueError(f"El campo '{parent_col}' es obligatorio para {meta['level']}.")
         _validate_parent_ref_exists(path=path, child_level=meta.get("level", ""), parent_ref=parent_ref)
@@ -154,20 +200,18 @@ def create_record(*, path: str, level: str, fields: Dict[str, Any]) -> tuple[str
         parent_ref = ""
 
     # Status default
-    status = str(fields.get("status", "") or "").strip() or "draft"
+    status = _clean(fields.get("status")) or "draft"
 
     # Generate new id
     new_hid = generate_next_human_id(path, sheet, prefix)
 
-    row = dict(fields)
-    row["human_id"] = new_hid
-    row["status"] = status
-    row["name"] = name
+    # New dict: the caller's fields are left untouched.
+    row = {**fields, "human_id": new_hid, "status": status, "name": name}
     if parent_col:
         row[parent_col] = parent_ref
 
     backup_registry(path)
     append_row_existing_columns(path, sheet, row)
 
-    view_full, issues, views_by_level = regenerate_views(path)
+    view_full, issues, views_by_level = _views_after_write(path)
     return new_hid, view_full, issues, views_by_level
\ No newline at end of file
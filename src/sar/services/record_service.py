@@ -8,38 +8,45 @@ from typing import Any, Dict, List, Optional
 import pandas as pd
 
 from sar.core.mapping import CHILD_SHEETS, detect_level
-from sar.core.utils import canon
+from sar.core.utils import canon, canon_series
 from sar.infra.registry_repo import read_sheet
 
 
-def get_row_by_human_id(df: pd.DataFrame, human_id: str) -> Optional[Dict[str, Any]]:
-    """Return a record dict (first match) for human_id, or None."""
+def get_row_by_human_id(
+    df: pd.DataFrame, human_id: str, *, index: Optional[Dict[str, int]] = None
+) -> Optional[Dict[str, Any]]:
+    """Return a record dict (first match) for human_id, or None.
+
+    If `index` ({canon(human_id): row position}, see build_hid_index) is given,
+    the lookup is a dict hit instead of a scan.
+    """
     if df is None or df.empty:
         return None
     if "human_id" not in df.columns:
         return None
     hid = canon(human_id)
-    tmp = df.copy()
-    tmp["__hid"] = tmp["human_id"].astype(str).map(canon)
-    hit = tmp[tmp["__hid"] == hid]
+    if index is not None:
+        pos = index.get(hid)
+        if pos is None:
+            return None
+        if pos < len(df) and canon(str(df["human_id"].iloc[pos])) == hid:
+            return df.iloc[pos].to_dict()
+        # Index out of sync with df: fall back to a scan
+    hit = df[canon_series(df["human_id"]) == hid]
     if hit.empty:
         return None
-    return hit.iloc[0].drop(labels=["__hid"]).to_dict()
+    return hit.iloc[0].to_dict()
 
 
 def list_children(path: str, parent_level: str, parent_hid: str) -> List[Dict[str, Any]]:
     """List immediate children of a record."""
     out: List[Dict[str, Any]] = []
     for child_level, sheet, parent_col in CHILD_SHEETS.get(parent_level, []):
-        df = read_sheet(path, sheet)
-        if df.empty or parent_col not in df.columns or "human_id" not in df.columns:
+        df = read_sheet(path, sheet, usecols=["human_id", "name", "status"], filters={parent_col: parent_hid})
+        if df.empty or "human_id" not in df.columns:
             continue
-        pid = canon(parent_hid)
-        tmp = df.copy()
-        tmp["__pid"] = tmp[parent_col].astype(str).map(canon)
-        tmp = tmp[tmp["__pid"] == pid]
 
-        for _, r in tmp.iterrows():
+        for _, r in df.iterrows():
             out.append(
                 {
                     "level": child_level,
@@ -67,45 +74,45 @@ def list_descendants_counts(path: str, level: str, human_id: str) -> Dict[str, i
         return counts
 
     if level == "C3":
-        c4 = read_sheet(path, "C4_Runtime")
+        c4 = read_sheet(path, "C4_Runtime", usecols=["c3_human_id"])
         if not c4.empty and "c3_human_id" in c4.columns:
-            counts["C4"] = int((c4["c3_human_id"].astype(str).map(canon) == hid).sum())
+            counts["C4"] = int((canon_series(c4["c3_human_id"]) == hid).sum())
         return counts
 
     if level == "C2":
-        c3 = read_sheet(path, "C3_Componentes")
+        c3 = read_sheet(path, "C3_Componentes", usecols=["human_id", "c2_human_id"])
         if not c3.empty and "c2_human_id" in c3.columns:
-            comps = c3[c3["c2_human_id"].astype(str).map(canon) == hid]
+            comps = c3[canon_series(c3["c2_human_id"]) == hid]
             counts["C3"] = int(len(comps))
-            comp_ids = set(comps["human_id"].astype(str).map(canon).tolist())
+            comp_ids = set(canon_series(comps["human_id"]).tolist())
         else:
             comp_ids = set()
 
-        c4 = read_sheet(path, "C4_Runtime")
+        c4 = read_sheet(path, "C4_Runtime", usecols=["c3_human_id"])
         if not c4.empty and "c3_human_id" in c4.columns and comp_ids:
-            counts["C4"] = int(c4["c3_human_id"].astype(str).map(canon).isin(comp_ids).sum())
+            counts["C4"] = int(canon_series(c4["c3_human_id"]).isin(comp_ids).sum())
         return counts
 
     if level == "C1":
-        c2 = read_sheet(path, "C2_Aplicaciones")
+        c2 = read_sheet(path, "C2_Aplicaciones", usecols=["human_id", "c1_human_id"])
         if not c2.empty and "c1_human_id" in c2.columns:
-            apps = c2[c2["c1_human_id"].astype(str).map(canon) == hid]
+            apps = c2[canon_series(c2["c1_human_id"]) == hid]
             counts["C2"] = int(len(apps))
-            app_ids = set(apps["human_id"].astype(str).map(canon).tolist())
+            app_ids = set(canon_series(apps["human_id"]).tolist())
         else:
             app_ids = set()
 
-        c3 = read_sheet(path, "C3_Componentes")
+        c3 = read_sheet(path, "C3_Componentes", usecols=["human_id", "c2_human_id"])
         if not c3.empty and "c2_human_id" in c3.columns and app_ids:
-            comps = c3[c3["c2_human_id"].astype(str).map(canon).isin(app_ids)]
+            comps = c3[canon_series(c3["c2_human_id"]).isin(app_ids)]
             counts["C3"] = int(len(comps))
-            comp_ids = set(comps["human_id"].astype(str).map(canon).tolist())
+            comp_ids = set(canon_series(comps["human_id"]).tolist())
         else:
             comp_ids = set()
 
-        c4 = read_sheet(path, "C4_Runtime")
+        c4 = read_sheet(path, "C4_Runtime", usecols=["c3_human_id"])
         if not c4.empty and "c3_human_id" in c4.columns and comp_ids:
-            counts["C4"] = int(c4["c3_human_id"].astype(str).map(canon).isin(comp_ids).sum())
+            counts["C4"] = int(canon_series(c4["c3_human_id"]).isin(comp_ids).sum())
 
         return counts
 
@@ -117,19 +124,18 @@ def issues_for(issues_df: pd.DataFrame, human_id: str) -> List[Dict[str, Any]]:
     df = issues_df
     if df is None or df.empty:
         return []
-    tmp = df.copy()
-    for c in ["human_id", "parent_ref", "severity", "level", "issue_type", "message", "suggested_fix"]:
-        if c not in tmp.columns:
-            tmp[c] = ""
     hid = canon(human_id)
-    tmp["__hid"] = tmp["human_id"].astype(str).map(canon)
-    tmp["__pid"] = tmp["parent_ref"].astype(str).map(canon)
-    hit = tmp[(tmp["__hid"] == hid) | (tmp["__pid"] == hid)]
+    mask = pd.Series(False, index=df.index)
+    for c in ("human_id", "parent_ref"):
+        if c in df.columns:
+            mask |= canon_series(df[c]) == hid
+    hit = df[mask]
     if hit.empty:
         return []
-    hit = hit.drop(columns=["__hid", "__pid"])
+    cols = ["human_id", "parent_ref", "severity", "level", "issue_type", "message", "suggested_fix"]
+    hit = hit.assign(**{c: "" for c in cols if c not in hit.columns})
     sev_order = {"error": 0, "warning": 1, "info": 2}
-    hit["__s"] = hit["severity"].astype(str).map(lambda x: sev_order.get(x, 9))
+    hit = hit.assign(__s=hit["severity"].astype(str).map(lambda x: sev_order.get(x, 9)))
     hit = hit.sort_values(by=["__s", "level", "issue_type"], ascending=[True, True, True]).drop(columns=["__s"])
     return hit.to_dict(orient="records")
 
@@ -16,7 +16,7 @@ import pandas as pd
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
-from sar.core.utils import canon
+from sar.core.utils import canon, canon_series
 from sar.infra.registry_repo import read_meta_dict, read_sheet
 from sar.services.diagram_service import build_record_diagram
 
@@ -46,21 +46,17 @@ def _get_row(df: pd.DataFrame, human_id: str) -> Optional[Dict[str, Any]]:
     if df is None or df.empty or "human_id" not in df.columns:
         return None
     hid = canon(human_id)
-    tmp = df.copy()
-    tmp["__hid"] = tmp["human_id"].astype(str).map(canon)
-    hit = tmp[tmp["__hid"] == hid]
+    hit = df[canon_series(df["human_id"]) == hid]
     if hit.empty:
         return None
-    return hit.iloc[0].drop(labels=["__hid"]).to_dict()
+    return hit.iloc[0].to_dict()
 
 
 def _list_children_min(df: pd.DataFrame, parent_col: str, parent_hid: str) -> List[Dict[str, str]]:
     if df is None or df.empty or "human_id" not in df.columns or parent_col not in df.columns:
         return []
     pid = canon(parent_hid)
-    tmp = df.copy()
-    tmp["__pid"] = tmp[parent_col].astype(str).map(canon)
-    tmp = tmp[tmp["__pid"] == pid].drop(columns=["__pid"])
+    tmp = df[canon_series(df[parent_col]) == pid]
     out = [_row_min(r.to_dict()) for _, r in tmp.iterrows()]
     out.sort(key=lambda x: canon(x.get("human_id", "")))
     return out
@@ -71,25 +67,16 @@ def _issues_for_id(issues_df: pd.DataFrame, human_id: str) -> List[Dict[str, str
     if issues_df is None or issues_df.empty:
         return []
     hid = canon(human_id)
-    df = issues_df.copy()
-    for c in [
-        "human_id",
-        "parent_ref",
-        "severity",
-        "level",
-        "issue_type",
-        "message",
-        "suggested_fix",
-    ]:
-        if c not in df.columns:
-            df[c] = ""
-    df["__hid"] = df["human_id"].astype(str).map(canon)
-    df["__pid"] = df["parent_ref"].astype(str).map(canon)
-    hit = df[(df["__hid"] == hid) | (df["__pid"] == hid)].drop(columns=["__hid", "__pid"])
+    mask = pd.Series(False, index=issues_df.index)
+    for c in ("human_id", "parent_ref"):
+        if c in issues_df.columns:
+            mask |= canon_series(issues_df[c]) == hid
+    hit = issues_df[mask]
     if hit.empty:
         return []
     sev_order = {"error": 0, "warning": 1, "info": 2}
-    hit["__s"] = hit["severity"].astype(str).map(lambda x: sev_order.get(x, 9))
+    hit = hit.assign(**{c: "" for c in ("severity", "issue_type") if c not in hit.columns})
+    hit = hit.assign(__s=hit["severity"].astype(str).map(lambda x: sev_order.get(x, 9)))
     hit = hit.sort_values(by=["__s", "issue_type"], ascending=[True, True]).drop(columns=["__s"])
     rows = []
     for _, r in hit.iterrows():
@@ -54,3 +54,88 @@ def test_report_endpoint_returns_html(tmp_registry, tmp_path, monkeypatch):
     assert r.status_code == 200
     assert r.headers["content-type"].startswith("text/html")
     assert "RUN-0001" in r.text
+
+
+def test_open_last_regenerates_in_background(tmp_registry, tmp_path, monkeypatch):
+    data_dir = Path(tmp_registry).parent
+    monkeypatch.setenv("SAR_DATA_DIR", str(data_dir))
+    monkeypatch.setenv("SAR_REPORTS_DIR", str(tmp_path))
+
+    import sar.app as app_module
+    importlib.reload(app_module)
+    app_module.app.dependency_overrides[app_module.require_user] = lambda: {"username": "test"}
+
+    client = TestClient(app_module.app)
+    r = client.get("/open-last", follow_redirects=False)
+    assert r.status_code == 303
+    assert r.headers["location"] == "/"
+
+    # Drain the single-worker executor, then the new views are in place.
+    app_module._REGEN_EXECUTOR.submit(lambda: None).result(timeout=60)
+    st = client.get("/regen/status").json()
+    assert st["in_progress"] is False
+    assert st["error"] == ""
+    assert app_module.STATE.path == st["path"]
+    assert not app_module.STATE.view_full.empty
+
+
+def test_registry_exists_check_is_cached(tmp_registry, monkeypatch):
+    import sar.app as app_module
+
+    reg = Path(tmp_registry)
+    monkeypatch.setattr(app_module, "STATE", app_module.AppState(path=str(reg)))
+    assert app_module._ensure_registry_loaded()
+
+    reg.unlink()
+    assert app_module._ensure_registry_loaded()  # cached within the TTL
+
+    monkeypatch.setattr(app_module, "PATH_CHECK_TTL", -1)
+    assert not app_module._ensure_registry_loaded()
+
+
+def test_view_full_table_layout():
+    import pandas as pd
+    import sar.app as app_module
+
+    df = pd.DataFrame({"c2__name": ["b"], "c1__human_id": ["PRJ-0001"], "extra": ["x"]})
+    groups, columns, rows = app_module._view_full_table(df)
+    assert [g["label"] for g in groups] == ["C1", "C2", ""]
+    assert [(c["label"], c["sep"], c["is_hid"]) for c in columns] == [
+        ("human_id", False, True),
+        ("name", True, False),
+        ("extra", True, False),
+    ]
+    assert rows == [("PRJ-0001", "b", "x")]
+
+
+def test_parent_search_ranks_id_prefixes_first(tmp_registry, monkeypatch):
+    import sar.app as app_module
+
+    monkeypatch.setattr(app_module, "STATE", app_module.AppState(path=str(tmp_registry)))
+    app_module._set_views(*app_module.regenerate_views(str(tmp_registry)))
+
+    items = app_module._search_parent_candidates(child_level="C4", q="cmp-000")
+    assert [i["human_id"] for i in items] == ["CMP-0001", "CMP-0002"]
+    assert items[0]["label"] == "CMP-0001 — Componente Uno"
+    # Name matches are literal and case-insensitive
+    assert [i["human_id"] for i in app_module._search_parent_candidates(child_level="C4", q="DOS")] == ["CMP-0002"]
+    assert app_module._search_parent_candidates(child_level="C4", q="(") == []
+
+
+def test_schema_state_is_cached_until_a_workbook_changes(tmp_registry, monkeypatch):
+    import sar.app as app_module
+
+    reg = Path(tmp_registry)
+    monkeypatch.setattr(app_module, "STATE", app_module.AppState(path=str(reg)))
+    monkeypatch.setattr(app_module, "TEMPLATE_PATH", reg.parent / "registry_template.xlsx")
+    calls = []
+    schema_map = app_module.get_schema_map
+    monkeypatch.setattr(app_module, "get_schema_map", lambda p, s: calls.append(p) or schema_map(p, s))
+
+    first = app_module._schema_state()
+    assert app_module._schema_state() is first
+    assert len(calls) == 2
+
+    app_module.write_meta_kv(str(reg), {"schema_version": "9.9.9"})
+    assert app_module._schema_state()["registry_schema_version"] == "9.9.9"
+    assert len(calls) == 4
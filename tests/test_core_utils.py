@@ -0,0 +1,39 @@
+import asyncio
+
+import pandas as pd
+
+from sar.core.utils import df_to_csv_stream, isin_ids, search_text, text_search_mask
+
+
+def test_text_search_mask_matches_any_column_case_insensitive():
+    df = pd.DataFrame(
+        {
+            "human_id": ["RUN-0001", "RUN-0002", "RUN-0003"],
+            "name": ["Frontend", "Backend API", "Worker"],
+            "owner": ["team-a", "team-b", "Team-API"],
+        }
+    )
+    mask = text_search_mask(df, "api")
+    assert df[mask]["human_id"].tolist() == ["RUN-0002", "RUN-0003"]
+    # Regex metacharacters are treated literally
+    assert not text_search_mask(df, "run-.*").any()
+    # A precomputed search_text frame gives the same mask
+    assert text_search_mask(df, "API", lowered=search_text(df)).equals(mask)
+
+
+def test_isin_ids_matches_series_isin():
+    values = pd.Series(["CMP-0001", "", "CMP-0009", "CMP-0001"])
+    ids = ["CMP-0001", "CMP-0002"]
+    assert isin_ids(values, ids).tolist() == values.isin(ids).tolist() == [True, False, False, True]
+    assert isin_ids(values.iloc[:0], ids).tolist() == []
+
+
+def test_df_to_csv_stream_chunks_match_full_csv():
+    df = pd.DataFrame({"a": [str(i) for i in range(25)], "b": ["x,y"] * 25})
+    resp = df_to_csv_stream(df, filename="t.csv", chunk_rows=7)
+
+    async def _collect():
+        return "".join([c async for c in resp.body_iterator])
+
+    assert asyncio.run(_collect()) == df.to_csv(index=False)
+    assert resp.headers["content-disposition"] == 'attachment; filename="t.csv"'
@@ -0,0 +1,52 @@
+import os
+
+from sar.infra.registry_repo import get_schema_map, get_sheet_headers, read_meta_dict, schema_hash
+from sar.services import crud_service
+from sar.services.crud_service import (
+    SCHEMA_SHEETS,
+    add_new_field,
+    batch,
+    create_record,
+    update_record_existing_fields,
+)
+
+
+def test_batch_regenerates_views_once(tmp_registry, monkeypatch):
+    calls = []
+    regenerate = crud_service.regenerate_views
+    monkeypatch.setattr(crud_service, "regenerate_views", lambda p: calls.append(p) or regenerate(p))
+
+    path = str(tmp_registry)
+    with batch(path) as result:
+        first, view_full, issues, views = create_record(path=path, level="C1", fields={"name": "Uno"})
+        second, *_ = create_record(path=path, level="C1", fields={"name": "Dos"})
+        assert (view_full, issues, views) == (None, None, None)
+        assert calls == []
+
+    assert calls == [path]
+    c1 = result.views[2]["C1"]
+    assert {first, second} <= set(c1["human_id"])
+
+
+def test_add_new_field_marks_schema_dirty_in_the_same_save(tmp_registry):
+    path = str(tmp_registry)
+    add_new_field(path=path, human_id="RUN-0001", field_name="Owner Team", value="blue")
+
+    assert "owner_team" in get_sheet_headers(path, "C4_Runtime")
+    meta = read_meta_dict(path)
+    assert meta["schema_dirty"] == "yes"
+    assert meta["schema_hash"] == schema_hash(get_schema_map(path, SCHEMA_SHEETS))
+
+
+def test_noop_update_leaves_the_workbook_alone(tmp_registry):
+    path = str(tmp_registry)
+    before = os.stat(path).st_mtime_ns
+
+    update_record_existing_fields(path=path, human_id="prj-0001", fields={"name": "Proyecto Uno", "status": "active"})
+    assert os.stat(path).st_mtime_ns == before
+    assert not list(tmp_registry.parent.glob("registry.xlsx.bak_*"))
+
+    _, _, views = update_record_existing_fields(path=path, human_id="PRJ-0001", fields={"name": "Nuevo"})
+    assert os.stat(path).st_mtime_ns != before
+    assert len(list(tmp_registry.parent.glob("registry.xlsx.bak_*"))) == 1
+    assert "Nuevo" in set(views["C1"]["name"])
@@ -1,4 +1,19 @@
-from sar.engine import compute
+import os
+
+import pandas as pd
+
+from sar.engine import (
+    ISSUE_COLUMNS,
+    VULN_FIELD,
+    _build_relation_helpers,
+    compute,
+    evaluate_rules,
+    issues_to_df,
+    normalize_and_derive_vulnerabilities,
+    validate_lookup_multi,
+    validate_lookup_single,
+    validate_required,
+)
 
 
 def test_compute_runs_and_returns_frames(tmp_registry):
@@ -10,3 +25,99 @@ def test_compute_runs_and_returns_frames(tmp_registry):
     for level in ("C1", "C2", "C3", "C4"):
         assert level in views_by_level
         assert not views_by_level[level].empty
+
+
+def test_validate_required_reports_row_then_column():
+    df = pd.DataFrame({"human_id": ["PRJ-1", "", "PRJ-3"], "name": ["", "b", " "], "status": ["", "", "x"]})
+    issues = []
+    validate_required(df, "C1", ["human_id", "status", "name"], issues)
+    assert [i.issue_id for i in issues] == [
+        "C1-REQ-PRJ-1-status",
+        "C1-REQ-PRJ-1-name",
+        "C1-REQ-ROW1-human_id",
+        "C1-REQ-ROW1-status",
+        "C1-REQ-PRJ-3-name",
+    ]
+
+
+def test_validate_lookups_single_and_multi():
+    df = pd.DataFrame({"human_id": ["RUN-1", "RUN-2", "RUN-3"], "env": ["dev", "dev; qa|prod", " uat "]})
+    lookups = {"env": {"dev", "prod"}}
+
+    single = []
+    validate_lookup_single(df, "C4", "env", "env", lookups, single)
+    assert [(i.human_id, i.message) for i in single] == [
+        ("RUN-2", "Valor inválido en env: 'dev; qa|prod' (lookup env)"),
+        ("RUN-3", "Valor inválido en env: 'uat' (lookup env)"),
+    ]
+
+    multi = []
+    validate_lookup_multi(df, "C4", "env", "env", lookups, multi)
+    assert [i.issue_id for i in multi] == ["C4-LOOKUP-RUN-2-env-qa", "C4-LOOKUP-RUN-3-env-uat"]
+    # Column without separators takes the no-explode path
+    plain = []
+    validate_lookup_multi(df.iloc[[0, 2]], "C4", "env", "env", lookups, plain)
+    assert [i.issue_id for i in plain] == ["C4-LOOKUP-RUN-3-env-uat"]
+
+
+def test_issues_to_df_keeps_schema_when_empty():
+    df = issues_to_df([])
+    assert df.empty
+    assert tuple(df.columns) == ISSUE_COLUMNS
+
+
+def test_vulnerabilities_inherit_up_the_chain():
+    c1 = pd.DataFrame({"human_id": ["PRJ-1", "PRJ-2", "PRJ-3"], VULN_FIELD: ["", "", ""]})
+    c2 = pd.DataFrame({
+        "human_id": ["APP-1", "APP-2", "APP-3"],
+        "c1_human_id": ["PRJ-1", "PRJ-1", "PRJ-2"],
+        VULN_FIELD: ["", "", ""],
+    })
+    c3 = pd.DataFrame({
+        "human_id": ["CMP-1", "CMP-2", "CMP-3"],
+        "c2_human_id": ["APP-1", "APP-2", "APP-2"],
+        VULN_FIELD: ["Y", "no", "maybe"],
+    })
+    c4 = pd.DataFrame({"human_id": ["RT-1"], "c3_human_id": ["CMP-1"], VULN_FIELD: ["0"]})
+    issues = []
+    views = normalize_and_derive_vulnerabilities(c1, c2, c3, c4, issues)
+    assert views["C4"][VULN_FIELD].tolist() == ["no"]
+    assert views["C3"][VULN_FIELD].tolist() == ["yes", "no", "unknown"]
+    # APP-2 has an invalid (-> unknown) child; APP-3 has no children at all.
+    assert views["C2"][VULN_FIELD].tolist() == ["yes", "unknown", "unknown"]
+    assert views["C1"][VULN_FIELD].tolist() == ["yes", "unknown", "unknown"]
+    assert [i.issue_id for i in issues] == ["C3-VULN-INVALID-CMP-3"]
+
+
+def test_evaluate_rules_combines_groups_and_relations():
+    c1 = pd.DataFrame({"human_id": ["PRJ-1"]})
+    c2 = pd.DataFrame({"human_id": ["APP-1", "APP-2", ""], "c1_human_id": ["PRJ-1", "PRJ-9", ""], "tier": ["gold", "", "x"]})
+    empty = pd.DataFrame({"human_id": pd.Series([], dtype=str)})
+    views = {"C1": c1, "C2": c2, "C3": empty, "C4": empty}
+    rule = {"level": "C2", "severity": "", "message": "m", "suggested_fix": "f"}
+    rules = pd.DataFrame([
+        {**rule, "rule_id": "R-ORPHAN", "group_id": "1", "logic": "AND", "when_field": "_rel", "op": "missing_parent", "value": "C1"},
+        # Group 1 (AND) never matches both; group 2 (OR) matches APP-1 only.
+        {**rule, "rule_id": "R-TIER", "group_id": "1", "logic": "AND", "when_field": "tier", "op": "empty", "value": ""},
+        {**rule, "rule_id": "R-TIER", "group_id": "1", "logic": "AND", "when_field": "tier", "op": "eq", "value": "gold"},
+        {**rule, "rule_id": "R-TIER", "group_id": "2", "logic": "OR", "when_field": "tier", "op": "contains", "value": "OL"},
+        {**rule, "rule_id": "R-TIER", "group_id": "2", "logic": "OR", "when_field": "missing", "op": "empty", "value": ""},
+    ])
+    issues = []
+    evaluate_rules(rules, views, _build_relation_helpers(c1, c2, empty, empty), issues)
+    assert [(i.issue_id, i.severity) for i in issues] == [
+        ("RULE-R-ORPHAN-APP-2", "error"),
+        ("RULE-R-TIER-APP-1", "error"),
+    ]
+
+
+def test_regenerate_views_is_cached_until_the_workbook_changes(tmp_registry):
+    from sar.services.compute_service import regenerate_views
+
+    path = str(tmp_registry)
+    first = regenerate_views(path)
+    assert regenerate_views(path) is first
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert regenerate_views(path) is not first
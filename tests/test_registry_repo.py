@@ -0,0 +1,60 @@
+import os
+
+from sar.infra.registry_repo import (
+    append_row_existing_columns,
+    backup_registry,
+    generate_next_human_id,
+    read_sheet,
+    read_sheets,
+    sheet_hid_index,
+    update_fields_existing,
+)
+
+
+def test_read_sheet_projects_columns_and_filters_rows(tmp_registry):
+    df = read_sheet(str(tmp_registry), "C4_Runtime", usecols=["human_id"], filters={"c3_human_id": "cmp-0001"})
+    assert set(df.columns) == {"human_id", "c3_human_id"}
+    assert sorted(df["human_id"].tolist()) == ["RUN-0001", "RUN-0002"]
+
+    none = read_sheet(str(tmp_registry), "C4_Runtime", filters={"missing_col": "x"})
+    assert none.empty
+
+
+def test_read_sheet_cache_is_invalidated_by_writes(tmp_registry):
+    path = str(tmp_registry)
+    before = read_sheet(path, "C1_Proyectos")
+    pos = sheet_hid_index(path, "C1_Proyectos")["PRJ-0001"]
+    assert before.iloc[pos]["human_id"] == "PRJ-0001"
+
+    # Callers get their own copy of the cached frame
+    before.loc[before.index[pos], "name"] = "mutated"
+    assert read_sheet(path, "C1_Proyectos").iloc[pos]["name"] == "Proyecto Uno"
+
+    update_fields_existing(path, "C1_Proyectos", "PRJ-0001", {"name": "Proyecto Renombrado"})
+    assert read_sheet(path, "C1_Proyectos").iloc[pos]["name"] == "Proyecto Renombrado"
+
+
+def test_read_sheets_matches_individual_reads(tmp_registry):
+    path = str(tmp_registry)
+    sheets = read_sheets(path, {"C4_Runtime": None, "C3_Componentes": ["human_id"]})
+    assert sheets["C4_Runtime"].equals(read_sheet(path, "C4_Runtime"))
+    assert sheets["C3_Componentes"].equals(read_sheet(path, "C3_Componentes", usecols=["human_id"]))
+
+
+def test_generate_next_human_id_follows_writes(tmp_registry):
+    path = str(tmp_registry)
+    assert generate_next_human_id(path, "C1_Proyectos", "PRJ-") == "PRJ-003"
+
+    append_row_existing_columns(path, "C1_Proyectos", {"human_id": " prj-0041 ", "name": "Manual"})
+    append_row_existing_columns(path, "C1_Proyectos", {"human_id": "PRJ-9X", "name": "Ignorado"})
+    assert generate_next_human_id(path, "C1_Proyectos", "PRJ-") == "PRJ-042"
+
+
+def test_backup_registry_reuses_an_up_to_date_backup(tmp_registry):
+    path = str(tmp_registry)
+    first = backup_registry(path)
+    assert backup_registry(path) == first
+
+    update_fields_existing(path, "C1_Proyectos", "PRJ-0001", {"name": "Otro nombre"})
+    second = backup_registry(path)
+    assert os.stat(second).st_mtime_ns == os.stat(path).st_mtime_ns